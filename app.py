@@ -1,13 +1,122 @@
 import binary_output
+import build_cache
+import chr_bank
+import errors
+from errors import CommandLineArgError
 import image_processor
+import os
+import profiler
 import rom_builder
+import sys
+import tile_index
 import view_renderer
+from palette_memo import get_memo
+from profiler import NULL_PROFILER
+
+
+# Views that can be created from a successful conversion, by option name.
+VIEW_OPTIONS = ['palette_view', 'colorization_view', 'reuse_view',
+                'nametable_view', 'chr_view', 'grid_view']
+
+
+# flip_map_filename
+#
+# Get the filename of the map saved along with the chr for --flip-chr, which
+# is the chr filename with its extension replaced by ".map".
+def flip_map_filename(flip_chr):
+  return os.path.splitext(flip_chr)[0] + '.map'
 
 
 class Application(object):
-  def run(self, img, args):
-    processor = image_processor.ImageProcessor()
+  # profiler: Profiler to record the stages of each conversion to, for callers
+  #           that want to look at it themselves. If not set, a report is shown
+  #           for each image when --profile is used.
+  # palette_memo: PaletteMemo of guessed palettes to reuse. Defaults to the
+  #               one shared by the process, which is saved between runs.
+  def __init__(self, profiler=None, palette_memo=None):
+    self.profiler = profiler
+    self.palette_memo = palette_memo or get_memo()
+    self.written = []
+    self.prof = profiler or NULL_PROFILER
+
+  # run
+  #
+  # Convert the image, returning whether it succeeded.
+  #
+  # img: The pixel art image.
+  # args: Command-line arguments.
+  # shared_bank: ChrBank shared with other images, or None.
+  def run(self, img, args, shared_bank=None):
+    if self.profiler is None and args.profile:
+      self.prof = profiler.Profiler()
+    if args.cache_dir:
+      ok = self.run_with_cache(img, args)
+    else:
+      ok = self.convert(img, args, shared_bank) is not None
+    if self.profiler is None and args.profile:
+      sys.stdout.write(self.prof.get_report(args.profile))
+    return ok
+
+  # run_with_cache
+  #
+  # Run the conversion, but first look for the outputs in the build cache.
+  # On a hit, the outputs are copied from the cache, without processing the
+  # image at all. Otherwise, the new outputs are saved to the cache.
+  def run_with_cache(self, img, args):
+    cache = build_cache.BuildCache(args.cache_dir,
+                                   args.cache_size * 1024 * 1024)
+    targets = self.output_targets(args)
+    with self.prof.stage('cache'):
+      key = cache.key(img, args, targets)
+      log = cache.restore(key, targets, only_changed=args.watch)
+    if log is not None:
+      self.written += cache.written()
+      sys.stdout.write(log)
+      return True
+    log = self.convert(img, args)
+    if log is None:
+      return False
+    with self.prof.stage('cache'):
+      cache.store(key, targets, log)
+    return True
+
+  # output_targets
+  #
+  # Get the filename for each kind of output that will be created.
+  def output_targets(self, args):
+    output = binary_output.BinaryOutput(self.output_template(args))
+    targets = {}
+    for kind in ['nametable', 'chr', 'palette', 'attribute']:
+      targets[kind] = output.fill_template(kind)
+    if args.compile:
+      targets['rom'] = args.compile
+    if args.flip_chr:
+      targets['flip_chr'] = args.flip_chr
+      targets['flip_map'] = flip_map_filename(args.flip_chr)
+    for option in VIEW_OPTIONS:
+      if getattr(args, option):
+        targets[option] = getattr(args, option)
+    return targets
+
+  def output_template(self, args):
+    out_tmpl = args.output or '%s.dat'
+    if not '%s' in out_tmpl:
+      raise CommandLineArgError('output needs "%s" in its template')
+    return out_tmpl
+
+  # convert
+  #
+  # Process the image and create all outputs. Returns the stats that were
+  # shown, or None if there were errors.
+  def convert(self, img, args, shared_bank=None):
+    processor = image_processor.ImageProcessor(
+        palette_search_budget=args.palette_search_budget,
+        palette_objective=args.palette_objective,
+        shared_bank=shared_bank, profiler=self.prof,
+        palette_memo=None if args.no_palette_memo else self.palette_memo)
     processor.process_image(img, args.palette, args.error_outfile)
+    if args.flip_chr and not processor.err().has():
+      self.check_flip_chr(processor)
     if processor.err().has():
       es = processor.err().get()
       print('Found {0} error{1}:'.format(len(es), 's'[len(es) == 1:]))
@@ -16,50 +125,111 @@ class Application(object):
       if args.error_outfile:
         print('Errors displayed in "{0}"'.format(args.error_outfile))
         errs = processor.err().get(include_dups=True)
-        renderer = view_renderer.ViewRenderer()
+        renderer = view_renderer.ViewRenderer(only_changed=args.watch)
         renderer.create_error_view(args.error_outfile, img, errs)
-      return
-    self.create_views(processor, args)
+      return None
+    with self.prof.stage('views'):
+      self.create_views(processor, args, img)
     self.create_output(processor, args)
-    self.show_stats(processor, args)
+    return self.show_stats(processor, args)
 
-  def create_views(self, processor, args):
+  # create_views
+  #
+  # Create the views that were asked for. When watching, views that come out
+  # the same are left alone, the same as the other outputs.
+  def create_views(self, processor, args, img):
+    renderers = []
     if args.palette_view:
-      renderer = view_renderer.ViewRenderer()
+      renderer = view_renderer.ViewRenderer(only_changed=args.watch)
       renderer.create_palette_view(args.palette_view, processor.palette())
+      renderers.append(renderer)
     if args.colorization_view:
-      renderer = view_renderer.ViewRenderer()
+      renderer = view_renderer.ViewRenderer(only_changed=args.watch)
       renderer.create_colorization_view(args.colorization_view,
           processor.artifacts(), processor.palette(),
           processor.color_manifest())
+      renderers.append(renderer)
     if args.reuse_view:
-      renderer = view_renderer.ViewRenderer()
+      renderer = view_renderer.ViewRenderer(only_changed=args.watch)
       renderer.create_reuse_view(args.reuse_view, processor.artifacts(),
           processor.nt_count())
+      renderers.append(renderer)
     if args.nametable_view:
-      renderer = view_renderer.ViewRenderer()
+      renderer = view_renderer.ViewRenderer(only_changed=args.watch)
       renderer.create_nametable_view(args.nametable_view, processor.artifacts())
+      renderers.append(renderer)
     if args.chr_view:
-      renderer = view_renderer.ViewRenderer()
+      renderer = view_renderer.ViewRenderer(only_changed=args.watch)
       renderer.create_chr_view(args.chr_view, processor.chr_data())
+      renderers.append(renderer)
     if args.grid_view:
-      renderer = view_renderer.ViewRenderer()
+      renderer = view_renderer.ViewRenderer(only_changed=args.watch)
       renderer.create_grid_view(args.grid_view, img)
+      renderers.append(renderer)
+    for renderer in renderers:
+      self.written += renderer.written()
 
   def create_output(self, processor, args):
-    out_tmpl = args.output or '%s.dat'
-    if not '%s' in out_tmpl:
-      raise CommandLineArgError('output needs "%s" in its template')
-    output = binary_output.BinaryOutput(out_tmpl)
-    output.save_nametable(processor.artifacts())
-    output.save_chr(processor.chr_data())
-    output.save_palette(processor.palette())
-    output.save_attribute(processor.artifacts())
+    with self.prof.stage('output'):
+      output = binary_output.BinaryOutput(self.output_template(args),
+                                          only_changed=args.watch)
+      output.save_nametable(processor.artifacts())
+      output.save_chr(processor.chr_data())
+      output.save_palette(processor.palette())
+      output.save_attribute(processor.artifacts())
+      if args.shared_chr:
+        output.save_bank(processor.bank_num())
+      self.written += [output.fill_template(kind) for kind in output.written()]
     if args.compile:
-      builder = rom_builder.RomBuilder()
-      builder.build(output, args.compile)
+      with self.prof.stage('rom'):
+        builder = rom_builder.RomBuilder()
+        self.write_output(args.compile, builder.build(output), args)
+    if args.flip_chr:
+      self.save_flip_chr(processor, args)
+
+  # write_output
+  #
+  # Write an output file, remembering its filename. When watching, files that
+  # already hold the same bytes are left alone, so that they don't trigger
+  # builds that depend on them.
+  def write_output(self, filename, data, args):
+    if binary_output.write_file(filename, data, only_changed=args.watch):
+      self.written.append(filename)
+
+  # check_flip_chr
+  #
+  # Make sure the merged chr for --flip-chr fits in a single bank, since its
+  # map stores each merged tile number in a byte.
+  def check_flip_chr(self, processor):
+    (tiles, mapping) = tile_index.merge_flips(processor.chr_data())
+    if len(tiles) > chr_bank.BANK_TILES:
+      processor.err().add(errors.ChrBankOverflowError(len(tiles), 1))
+
+  # save_flip_chr
+  #
+  # Save the chr with tiles that are flips of each other merged, as they can
+  # be for sprites, along with the map from each tile of the full chr to the
+  # merged tile and the flip that draws it.
+  def save_flip_chr(self, processor, args):
+    (tiles, mapping) = tile_index.merge_flips(processor.chr_data())
+    output = binary_output.BinaryOutput()
+    output.save_chr(tiles)
+    self.write_output(args.flip_chr, output.get_product('chr'), args)
+    data = bytearray()
+    for (n, flags) in mapping:
+      data += bytearray([n, flags])
+    self.write_output(flip_map_filename(args.flip_chr), str(data), args)
 
   def show_stats(self, processor, args):
-    print('Number of dot-profiles: {0}'.format(processor.dot_manifest().size()))
-    print('Number of tiles: {0}'.format(len(processor.chr_data())))
-    print('Palette: {0}'.format(processor.palette()))
+    log = ('Number of dot-profiles: {0}\n'.format(
+             processor.dot_manifest().size()) +
+           'Number of tiles: {0}\n'.format(len(processor.screen_tiles())) +
+           'Palette: {0}\n'.format(processor.palette()))
+    if args.shared_chr:
+      log += 'Chr bank: {0}, holding {1} tiles so far\n'.format(
+        processor.bank_num(), len(processor.chr_data()))
+    if args.tile_report:
+      for (desc, count) in tile_index.get_report(processor.screen_tiles()):
+        log += 'Number of tiles {0}: {1}\n'.format(desc, count)
+    sys.stdout.write(log)
+    return log
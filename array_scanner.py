@@ -0,0 +1,121 @@
+import errors
+import rgb
+from constants import *
+
+try:
+  import numpy
+except ImportError:
+  numpy = None
+
+
+# is_available
+#
+# Return whether the array-backed scanner can be used, which requires numpy.
+def is_available():
+  return numpy is not None
+
+
+# ArrayScanner
+#
+# Computes color needs and dot profiles for every tile at once. Produces the
+# same results as ImageProcessor.process_tile, but reads the image as a single
+# buffer and handles all tiles with batched array operations, instead of
+# visiting each pixel from python.
+class ArrayScanner(object):
+
+  def __init__(self):
+    self._results = None
+    self.num_colors = 0
+
+  # scan
+  #
+  # Scan the entire image, saving the result for each tile.
+  #
+  # img: The pixel art image.
+  # to_nescolor: Function that converts (r, g, b) to a nescolor, or -1.
+  def scan(self, img, to_nescolor):
+    rgb_img = img.convert('RGB')
+    (image_x, image_y) = rgb_img.size
+    num_tiles_y = NUM_BLOCKS_Y * 2
+    num_tiles_x = NUM_BLOCKS_X * 2
+    self._results = [[None] * num_tiles_x for row in xrange(num_tiles_y)]
+    # Tiles that overrun the image are empty, same as process_tile.
+    rows = min(image_y / TILE_SIZE, num_tiles_y)
+    cols = min(image_x / TILE_SIZE, num_tiles_x)
+    if rows and cols:
+      self.scan_region(rgb_img, rows, cols, to_nescolor)
+
+  # get
+  #
+  # Get the result for a single tile, or raise the error found in it.
+  #
+  # tile_y: The y position of the tile, 0..29.
+  # tile_x: The x position of the tile, 0..31.
+  # Returns the color_needs and dot_profile.
+  def get(self, tile_y, tile_x):
+    result = self._results[tile_y][tile_x]
+    if result is None:
+      return [None] * 4, [0] * (TILE_SIZE * TILE_SIZE)
+    if isinstance(result, Exception):
+      raise result
+    return result
+
+  # to_nescolor_plane
+  #
+  # Convert the image buffer into a plane of nescolors, using one lookup for
+  # each distinct color. Colors that can't be converted become -1.
+  def to_nescolor_plane(self, pixels, to_nescolor):
+    packed = ((pixels[:,:,0].astype(numpy.int32) << 16) |
+              (pixels[:,:,1].astype(numpy.int32) << 8) |
+              pixels[:,:,2].astype(numpy.int32))
+    (uniq, inverse) = numpy.unique(packed, return_inverse=True)
+    xlat = rgb.RGB_XLAT
+    lookup = numpy.empty(len(uniq), dtype=numpy.int16)
+    self.num_colors += len(uniq)
+    for k, color_val in enumerate(uniq.tolist()):
+      if color_val in xlat:
+        lookup[k] = xlat[color_val]
+      else:
+        lookup[k] = to_nescolor(color_val / (256 * 256),
+                                (color_val / 256) % 256, color_val % 256)
+    return lookup[inverse].reshape(packed.shape)
+
+  def scan_region(self, rgb_img, rows, cols, to_nescolor):
+    size = TILE_SIZE * TILE_SIZE
+    pixels = numpy.asarray(rgb_img)[:rows * TILE_SIZE, :cols * TILE_SIZE]
+    plane = self.to_nescolor_plane(pixels, to_nescolor)
+    # One row of 64 nescolors per tile, in the same order as process_tile.
+    tiles = plane.reshape(rows, TILE_SIZE, cols, TILE_SIZE).swapaxes(1, 2)
+    tiles = tiles.reshape(rows, cols, size)
+    # For each dot, the position of the first dot in the tile with its color.
+    first = (tiles[:,:,:,None] == tiles[:,:,None,:]).argmax(axis=3)
+    is_first = first == numpy.arange(size)
+    # Colors are numbered in order of their first appearance.
+    rank = numpy.cumsum(is_first, axis=2) - 1
+    (grid_y, grid_x) = numpy.ogrid[:rows, :cols]
+    dots = rank[grid_y[:,:,None], grid_x[:,:,None], first]
+    num_colors = is_first.sum(axis=2)
+    needs = []
+    for k in xrange(PALETTE_SIZE):
+      pos = (is_first & (rank == k)).argmax(axis=2)
+      needs.append(tiles[grid_y, grid_x, pos].tolist())
+    bad = tiles < 0
+    has_bad = bad.any(axis=2).tolist()
+    first_bad = bad.argmax(axis=2).tolist()
+    num_colors = num_colors.tolist()
+    dots = dots.tolist()
+    for y in xrange(rows):
+      for x in xrange(cols):
+        if has_bad[y][x]:
+          offset = first_bad[y][x]
+          (i, j) = (offset / TILE_SIZE, offset % TILE_SIZE)
+          p = tuple(pixels[y * TILE_SIZE + i, x * TILE_SIZE + j].tolist())
+          self._results[y][x] = errors.ColorNotAllowedError(p, y, x, i, j)
+          continue
+        if num_colors[y][x] > PALETTE_SIZE:
+          self._results[y][x] = errors.PaletteOverflowError(y, x)
+          continue
+        color_needs = [None] * 4
+        for k in xrange(num_colors[y][x]):
+          color_needs[k] = needs[k][y][x]
+        self._results[y][x] = (color_needs, dots[y][x])
@@ -0,0 +1,44 @@
+import unittest
+
+import array_scanner
+import errors
+from PIL import Image
+import image_processor
+
+
+class ArrayScannerTests(unittest.TestCase):
+  def scan_both(self, filename):
+    img = Image.open(filename)
+    processor = image_processor.ImageProcessor()
+    processor.load_image(img)
+    scanner = array_scanner.ArrayScanner()
+    scanner.scan(img, processor.components_to_nescolor)
+    return processor, scanner
+
+  def test_same_as_process_tile(self):
+    for name in ['blue-tile', 'blue-and-red-tile', 'red-and-blue-tile',
+                 'gradiant-tile']:
+      (processor, scanner) = self.scan_both('testdata/%s.png' % name)
+      self.assertEqual(scanner.get(0, 0), processor.process_tile(0, 0))
+
+  def test_overrun_tile_is_empty(self):
+    (processor, scanner) = self.scan_both('testdata/blue-tile.png')
+    self.assertEqual(scanner.get(0, 1), ([None] * 4, [0] * 64))
+    self.assertEqual(scanner.get(1, 0), processor.process_tile(1, 0))
+
+  def test_error_color_not_allowed(self):
+    (processor, scanner) = self.scan_both('testdata/color-not-allowed-tile.png')
+    with self.assertRaises(errors.ColorNotAllowedError) as cm:
+      scanner.get(0, 0)
+    with self.assertRaises(errors.ColorNotAllowedError) as expect:
+      processor.process_tile(0, 0)
+    self.assertEqual(str(cm.exception), str(expect.exception))
+
+  def test_error_palette_overflow(self):
+    (processor, scanner) = self.scan_both('testdata/palette-overflow-tile.png')
+    with self.assertRaises(errors.PaletteOverflowError):
+      scanner.get(0, 0)
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,87 @@
+import array
+from constants import *
+
+
+# Type of each plane of the table, indexed by the ARTIFACT_* constants.
+PLANE_TYPECODES = ['i', 'i', 'i', 'B', 'H', 'B']
+
+
+# ArtifactTable
+#
+# Ids and results for every tile of the image, created by the image processor
+# and used to make the outputs and views. Each kind of artifact is kept in its
+# own contiguous plane, one entry per tile in row-major order, so that the
+# table stays small and a whole plane can be handed to the outputs at once.
+class ArtifactTable(object):
+  def __init__(self, num_tiles_y=NUM_BLOCKS_Y * 2,
+               num_tiles_x=NUM_BLOCKS_X * 2):
+    self.num_tiles_y = num_tiles_y
+    self.num_tiles_x = num_tiles_x
+    size = num_tiles_y * num_tiles_x
+    self._planes = [array.array(t, [0]) * size for t in PLANE_TYPECODES]
+
+  # get
+  #
+  # Get an artifact of a tile.
+  #
+  # y: The y position of the tile.
+  # x: The x position of the tile.
+  # kind: Which artifact, one of the ARTIFACT_* constants.
+  def get(self, y, x, kind):
+    return self._planes[kind][y * self.num_tiles_x + x]
+
+  # set
+  #
+  # Set an artifact of a tile.
+  #
+  # y: The y position of the tile.
+  # x: The x position of the tile.
+  # kind: Which artifact, one of the ARTIFACT_* constants.
+  # value: The new value.
+  def set(self, y, x, kind, value):
+    self._planes[kind][y * self.num_tiles_x + x] = value
+
+  # set_block
+  #
+  # Set an artifact of all four tiles in a block.
+  #
+  # block_y: The y position of the block.
+  # block_x: The x position of the block.
+  # kind: Which artifact, one of the ARTIFACT_* constants.
+  # value: The new value.
+  def set_block(self, block_y, block_x, kind, value):
+    plane = self._planes[kind]
+    k = block_y * 2 * self.num_tiles_x + block_x * 2
+    plane[k] = plane[k + 1] = value
+    k += self.num_tiles_x
+    plane[k] = plane[k + 1] = value
+
+  # clear_tile
+  #
+  # Reset every artifact of a tile to zero, and mark it as having an error.
+  #
+  # y: The y position of the tile.
+  # x: The x position of the tile.
+  def clear_tile(self, y, x):
+    k = y * self.num_tiles_x + x
+    for plane in self._planes:
+      plane[k] = 0
+    self._planes[ARTIFACT_ERR][k] = 1
+
+  # clear_plane
+  #
+  # Reset an artifact of every tile to zero.
+  #
+  # kind: Which artifact, one of the ARTIFACT_* constants.
+  def clear_plane(self, kind):
+    size = self.num_tiles_y * self.num_tiles_x
+    self._planes[kind] = array.array(PLANE_TYPECODES[kind], [0]) * size
+
+  # plane
+  #
+  # Get an entire plane, as an array with one entry per tile in row-major
+  # order. The array is owned by the table and should not be modified.
+  #
+  # kind: Which artifact, one of the ARTIFACT_* constants.
+  def plane(self, kind):
+    return self._planes[kind]
@@ -0,0 +1,46 @@
+import unittest
+
+import artifact_table
+from constants import *
+
+
+class ArtifactTableTests(unittest.TestCase):
+  def test_get_set(self):
+    table = artifact_table.ArtifactTable()
+    table.set(3, 5, ARTIFACT_CID, 7)
+    table.set(3, 5, ARTIFACT_NT, 300)
+    self.assertEqual(table.get(3, 5, ARTIFACT_CID), 7)
+    self.assertEqual(table.get(3, 5, ARTIFACT_NT), 300)
+    self.assertEqual(table.get(3, 5, ARTIFACT_DID), 0)
+    self.assertEqual(table.get(3, 6, ARTIFACT_CID), 0)
+    self.assertEqual(table.plane(ARTIFACT_CID)[3 * 32 + 5], 7)
+    self.assertEqual(len(table.plane(ARTIFACT_PID)), 30 * 32)
+
+  def test_set_block(self):
+    table = artifact_table.ArtifactTable()
+    table.set_block(2, 4, ARTIFACT_PID, 3)
+    self.assertEqual([table.get(y, x, ARTIFACT_PID)
+                      for y in xrange(4, 6) for x in xrange(7, 11)],
+                     [0, 3, 3, 0, 0, 3, 3, 0])
+
+  def test_clear_tile(self):
+    table = artifact_table.ArtifactTable()
+    table.set(1, 1, ARTIFACT_CID, 4)
+    table.set(1, 1, ARTIFACT_BCID, 2)
+    table.clear_tile(1, 1)
+    self.assertEqual(table.get(1, 1, ARTIFACT_CID), 0)
+    self.assertEqual(table.get(1, 1, ARTIFACT_BCID), 0)
+    self.assertEqual(table.get(1, 1, ARTIFACT_ERR), 1)
+    self.assertEqual(table.get(1, 0, ARTIFACT_ERR), 0)
+
+  def test_clear_plane(self):
+    table = artifact_table.ArtifactTable()
+    table.set(1, 1, ARTIFACT_NT, 4)
+    table.set(1, 1, ARTIFACT_CID, 2)
+    table.clear_plane(ARTIFACT_NT)
+    self.assertEqual(table.get(1, 1, ARTIFACT_NT), 0)
+    self.assertEqual(table.get(1, 1, ARTIFACT_CID), 2)
+
+
+if __name__ == '__main__':
+  unittest.main()
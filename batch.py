@@ -0,0 +1,257 @@
+import app
+import chr_bank
+import copy
+import csv
+from errors import CommandLineArgError
+import glob
+import json
+import multiprocessing
+import nearest_color
+import os
+from PIL import Image
+import StringIO
+import sys
+import time
+
+
+# Filename options that are expanded separately for each image in a batch,
+# along with their command-line flags.
+FILENAME_OPTIONS = [('output', '-o'),
+                    ('compile', '-c'),
+                    ('error_outfile', '-e'),
+                    ('flip_chr', '--flip-chr'),
+                    ('palette_view', '--palette-view'),
+                    ('colorization_view', '--colorization-view'),
+                    ('reuse_view', '--reuse-view'),
+                    ('nametable_view', '--nametable-view'),
+                    ('chr_view', '--chr-view'),
+                    ('grid_view', '--grid-view')]
+
+DEFAULT_BATCH_OUTPUT = '%n.%s.dat'
+
+
+# check_filename_options
+#
+# Make sure that each filename option names a different file for each image,
+# by having "%n" in it.
+#
+# args: Command-line arguments for the whole batch.
+def check_filename_options(args):
+  for (option, flag) in FILENAME_OPTIONS:
+    value = getattr(args, option)
+    if value and not '%n' in value:
+      raise CommandLineArgError('%s needs "%%n" in its filename when '
+                                'converting multiple images' % flag)
+
+
+class BatchJob(object):
+  def __init__(self, input, palette=None, output=None):
+    self.input = input
+    self.palette = palette
+    self.output = output
+
+  def name(self):
+    return os.path.splitext(os.path.basename(self.input))[0]
+
+
+# expand_inputs
+#
+# Turn a list of filenames and glob patterns into jobs, in the order given.
+# Each pattern is expanded in sorted order.
+#
+# patterns: List of filenames or glob patterns.
+def expand_inputs(patterns):
+  jobs = []
+  for p in patterns:
+    if glob.has_magic(p):
+      matches = sorted(glob.glob(p))
+      if not matches:
+        raise CommandLineArgError('No files match "%s"' % p)
+      jobs += [BatchJob(m) for m in matches]
+    else:
+      jobs.append(BatchJob(p))
+  return jobs
+
+
+# load_manifest
+#
+# Read jobs from a manifest file. A .json manifest is a list, with either a
+# filename or an object with keys "input", "palette" and "output" for each
+# image. A .csv manifest has a header row naming the same columns. Input
+# filenames are relative to the directory of the manifest.
+#
+# filename: Path of the manifest.
+def load_manifest(filename):
+  base = os.path.dirname(filename)
+  fin = open(filename, 'r')
+  try:
+    if filename.lower().endswith('.csv'):
+      entries = list(csv.DictReader(fin))
+    else:
+      entries = json.load(fin)
+  except ValueError as e:
+    raise CommandLineArgError('Could not read manifest "%s": %s' %
+                              (filename, e))
+  finally:
+    fin.close()
+  jobs = []
+  for entry in entries:
+    if not isinstance(entry, dict):
+      entry = {'input': entry}
+    if not entry.get('input'):
+      raise CommandLineArgError('Manifest entry has no input: %s' % entry)
+    jobs.append(BatchJob(os.path.join(base, entry['input']),
+                         entry.get('palette') or None,
+                         entry.get('output') or None))
+  return jobs
+
+
+class BatchResult(object):
+  def __init__(self, job, ok, elapsed, log=None):
+    self.job = job
+    self.ok = ok
+    self.elapsed = elapsed
+    self.log = log
+
+
+# convert_job
+#
+# Convert a single image. When capture is set, anything printed during the
+# conversion, such as errors and stats, is saved in the result instead. This
+# lets worker processes send their output back to be shown in order.
+#
+# work: Tuple of the BatchJob and the arguments for it.
+# capture: Whether to capture printed output.
+# shared_bank: ChrBank shared by all images, or None.
+def convert_job(work, capture=False, shared_bank=None):
+  (job, job_args) = work
+  if capture:
+    real_stdout = sys.stdout
+    sys.stdout = StringIO.StringIO()
+  start = time.time()
+  try:
+    try:
+      img = Image.open(job.input)
+    except IOError:
+      print('Input file not found: "{0}"'.format(job.input))
+      ok = False
+    else:
+      ok = app.Application().run(img, job_args, shared_bank)
+  finally:
+    if capture:
+      log = sys.stdout.getvalue()
+      sys.stdout = real_stdout
+  return BatchResult(job, ok, time.time() - start, log if capture else None)
+
+
+def capture_job(work):
+  return convert_job(work, capture=True)
+
+
+# init_worker
+#
+# Called once in each worker process. Workers are forked from the main
+# process, which loads the nearest color table first, so this only needs to
+# load it when that didn't happen.
+def init_worker():
+  nearest_color.get_table()
+
+
+class BatchRunner(object):
+  def __init__(self):
+    self.results = []
+    self.elapsed = 0.0
+    self.shared_bank = None
+
+  # job_args
+  #
+  # Make the arguments for a single job. The palette and output template
+  # from the job override those from the command-line. In all filename
+  # options, "%n" is replaced by the name of the input image.
+  #
+  # job: The BatchJob.
+  # args: Command-line arguments for the whole batch.
+  def job_args(self, job, args):
+    job_args = copy.copy(args)
+    if job.palette:
+      job_args.palette = job.palette
+    job_args.output = job.output or args.output or DEFAULT_BATCH_OUTPUT
+    for (option, flag) in FILENAME_OPTIONS:
+      value = getattr(job_args, option)
+      if value:
+        setattr(job_args, option, value.replace('%n', job.name()))
+    return job_args
+
+  def check_args(self, jobs, args):
+    if args.shared_chr and args.jobs > 1:
+      raise CommandLineArgError('--shared-chr can not be used with --jobs')
+    if args.shared_chr and args.cache_dir:
+      raise CommandLineArgError('--shared-chr can not be used with '
+                                '--cache-dir')
+    if len(jobs) >= 2:
+      check_filename_options(args)
+
+  # run
+  #
+  # Convert each image, keeping caches warm for the entire batch. With a
+  # single job, images are converted in turn by this process. Otherwise, a
+  # pool of worker processes converts them in parallel, and their output is
+  # shown in the same order as the inputs. With a shared chr bank, images are
+  # always converted in turn, and the combined chr is saved at the end.
+  # Returns the number of images that failed.
+  #
+  # jobs: List of BatchJobs.
+  # args: Command-line arguments for the whole batch.
+  # num_jobs: Number of images to convert in parallel.
+  def run(self, jobs, args, num_jobs=1):
+    self.check_args(jobs, args)
+    work = [(job, self.job_args(job, args)) for job in jobs]
+    self.results = []
+    start = time.time()
+    num_jobs = min(num_jobs, len(work))
+    if args.shared_chr:
+      self.shared_bank = chr_bank.ChrBank(args.chr_banks)
+      for w in work:
+        print('== {0}'.format(w[0].input))
+        self.results.append(convert_job(w, shared_bank=self.shared_bank))
+      self.save_shared_chr(args.shared_chr)
+    elif num_jobs > 1:
+      init_worker()
+      pool = multiprocessing.Pool(num_jobs, init_worker)
+      try:
+        for result in pool.imap(capture_job, work):
+          print('== {0}'.format(result.job.input))
+          sys.stdout.write(result.log)
+          self.results.append(result)
+      finally:
+        pool.close()
+        pool.join()
+    else:
+      for w in work:
+        print('== {0}'.format(w[0].input))
+        self.results.append(convert_job(w))
+    self.elapsed = time.time() - start
+    self.show_summary()
+    return len([r for r in self.results if not r.ok])
+
+  def save_shared_chr(self, filename):
+    fout = open(filename, 'wb')
+    fout.write(self.shared_bank.get_bytes())
+    fout.close()
+
+  def show_summary(self):
+    print('')
+    total = 0.0
+    for r in self.results:
+      total += r.elapsed
+      print('{0:>9.1f}ms  {1}{2}'.format(r.elapsed * 1000, r.job.input,
+                                         '' if r.ok else '  (failed)'))
+    count = len(self.results)
+    failed = len([r for r in self.results if not r.ok])
+    print('Converted {0} image{1} in {2:.2f}s, {3:.1f}ms average, '
+          '{4} failed'.format(count, 's'[count == 1:], self.elapsed,
+                              total * 1000 / max(count, 1), failed))
+    if self.shared_bank:
+      num_banks = self.shared_bank.num_banks()
+      print('Shared chr: {0} tiles in {1} bank{2}'.format(
+          self.shared_bank.num_tiles(), num_banks, 's'[num_banks == 1:]))
@@ -0,0 +1,144 @@
+import unittest
+
+import batch
+from errors import CommandLineArgError
+import makechr
+import os
+from PIL import Image
+import shutil
+import StringIO
+import sys
+import tempfile
+
+
+class BatchTests(unittest.TestCase):
+  def setUp(self):
+    self.tmpdir = tempfile.mkdtemp()
+
+  def tearDown(self):
+    shutil.rmtree(self.tmpdir)
+
+  def make_args(self, **kwargs):
+    args = makechr.make_parser().parse_args(['-X'])
+    for k, v in kwargs.items():
+      setattr(args, k, v)
+    return args
+
+  def write_file(self, name, content):
+    filename = os.path.join(self.tmpdir, name)
+    fout = open(filename, 'w')
+    fout.write(content)
+    fout.close()
+    return filename
+
+  def test_expand_inputs(self):
+    jobs = batch.expand_inputs(['testdata/blue*.png', 'other.png'])
+    self.assertEqual([j.input for j in jobs],
+                     ['testdata/blue-and-red-tile.png',
+                      'testdata/blue-tile.png', 'other.png'])
+    with self.assertRaises(CommandLineArgError):
+      batch.expand_inputs(['testdata/*.gif'])
+
+  def test_load_json_manifest(self):
+    filename = self.write_file('list.json', '["a.png", {"input": "b.png", '
+                               '"palette": "P/0f-01/", "output": "b-%s"}]')
+    jobs = batch.load_manifest(filename)
+    self.assertEqual(len(jobs), 2)
+    self.assertEqual(jobs[0].input, os.path.join(self.tmpdir, 'a.png'))
+    self.assertEqual(jobs[0].palette, None)
+    self.assertEqual(jobs[1].input, os.path.join(self.tmpdir, 'b.png'))
+    self.assertEqual(jobs[1].palette, 'P/0f-01/')
+    self.assertEqual(jobs[1].output, 'b-%s')
+
+  def test_load_csv_manifest(self):
+    filename = self.write_file('list.csv', 'input,palette,output\n'
+                               'a.png,,\nb.png,P/0f-01/,b-%s\n')
+    jobs = batch.load_manifest(filename)
+    self.assertEqual([j.name() for j in jobs], ['a', 'b'])
+    self.assertEqual(jobs[0].output, None)
+    self.assertEqual(jobs[1].palette, 'P/0f-01/')
+
+  def test_job_args(self):
+    runner = batch.BatchRunner()
+    args = self.make_args(palette='P/0f/', chr_view='views/%n-chr.png')
+    job_args = runner.job_args(batch.BatchJob('art/title.png'), args)
+    self.assertEqual(job_args.palette, 'P/0f/')
+    self.assertEqual(job_args.output, 'title.%s.dat')
+    self.assertEqual(job_args.chr_view, 'views/title-chr.png')
+    self.assertEqual(args.chr_view, 'views/%n-chr.png')
+    job = batch.BatchJob('art/title.png', 'P/30/', 'out/%n-%s.bin')
+    job_args = runner.job_args(job, args)
+    self.assertEqual(job_args.palette, 'P/30/')
+    self.assertEqual(job_args.output, 'out/title-%s.bin')
+
+  def test_filenames_need_name(self):
+    runner = batch.BatchRunner()
+    jobs = [batch.BatchJob('a.png'), batch.BatchJob('b.png')]
+    with self.assertRaises(CommandLineArgError):
+      runner.check_args(jobs, self.make_args(compile='game.nes'))
+    runner.check_args(jobs, self.make_args(compile='%n.nes'))
+
+  def test_run_in_parallel(self):
+    names = []
+    for (name, color) in [('black', (0, 0, 0)), ('blue', (0, 0x78, 0xf8)),
+                          ('bad', (0xff, 0x00, 0xff)), ('gray', (0x7c, 0x7c, 0x7c))]:
+      names.append(os.path.join(self.tmpdir, name + '.png'))
+      Image.new('RGB', (256, 240), color).save(names[-1])
+    runner = batch.BatchRunner()
+    jobs = batch.expand_inputs(names)
+    args = self.make_args(output=os.path.join(self.tmpdir, '%n-%s.dat'))
+    real_stdout = sys.stdout
+    sys.stdout = StringIO.StringIO()
+    try:
+      failed = runner.run(jobs, args, num_jobs=2)
+    finally:
+      log = sys.stdout.getvalue()
+      sys.stdout = real_stdout
+    self.assertEqual(failed, 1)
+    self.assertEqual([r.job.input for r in runner.results], names)
+    self.assertEqual([r.ok for r in runner.results], [True, True, False, True])
+    self.assertTrue(log.index('blue.png') < log.index('ColorNotAllowedError') <
+                    log.index('gray.png'))
+    self.assertTrue(os.path.isfile(os.path.join(self.tmpdir, 'blue-chr.dat')))
+
+  def test_shared_chr(self):
+    names = []
+    for name in ['first', 'second']:
+      names.append(os.path.join(self.tmpdir, name + '.png'))
+      img = Image.new('RGB', (256, 240), (0, 0x78, 0xf8))
+      if name == 'second':
+        # Half of the first tile is black, so the image needs a new palette
+        # and two tiles of its own.
+        img.paste((0, 0, 0), (0, 0, 4, 8))
+      img.save(names[-1])
+    shared_chr = os.path.join(self.tmpdir, 'shared.chr')
+    runner = batch.BatchRunner()
+    jobs = batch.expand_inputs(names)
+    args = self.make_args(output=os.path.join(self.tmpdir, '%n-%s.dat'),
+                          shared_chr=shared_chr)
+    with self.assertRaises(CommandLineArgError):
+      runner.run(jobs, self.make_args(shared_chr=shared_chr, jobs=2))
+    real_stdout = sys.stdout
+    sys.stdout = StringIO.StringIO()
+    try:
+      failed = runner.run(jobs, args)
+    finally:
+      log = sys.stdout.getvalue()
+      sys.stdout = real_stdout
+    self.assertEqual(failed, 0)
+    self.assertTrue('Shared chr: 3 tiles in 1 bank' in log)
+    self.assertEqual(os.path.getsize(shared_chr), 8192)
+    self.assertTrue(os.path.isfile(os.path.join(self.tmpdir,
+                                                'second-nametable.dat')))
+    # Each image counts its own tiles, apart from those in the bank so far.
+    self.assertTrue('Number of tiles: 1\nPalette: P/11/\n'
+                    'Chr bank: 0, holding 1 tiles so far' in log)
+    self.assertTrue('Number of tiles: 2\nPalette: P/0f-11/\n'
+                    'Chr bank: 0, holding 3 tiles so far' in log)
+    fin = open(os.path.join(self.tmpdir, 'second-bank.dat'), 'rb')
+    self.assertEqual(fin.read(), '\x00')
+    fin.close()
+
+
+if __name__ == '__main__':
+  unittest.main()
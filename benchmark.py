@@ -0,0 +1,266 @@
+import app
+import argparse
+import build_cache
+import image_processor
+import json
+import makechr
+import nearest_color
+import os
+from PIL import Image
+import random
+import rgb
+import shutil
+import sys
+import tempfile
+import time
+from constants import *
+
+
+STAGES = ['load', 'scan', 'palette', 'attributes', 'chr', 'output', 'views']
+
+BG_COLOR = 0x0f
+
+# Stages that are slower than this, compared to the baseline, are reported as
+# regressions. Stages faster than MIN_SECONDS are ignored, since their timing
+# is mostly noise.
+DEFAULT_THRESHOLD = 1.25
+MIN_SECONDS = 0.002
+
+
+def to_rgb(nc):
+  val = rgb.RGB_COLORS[nc]
+  return (val / (256 * 256), (val / 256) % 256, val % 256)
+
+
+# make_image
+#
+# Make an image by choosing the nescolor of each pixel.
+#
+# pixel_func: Function from (y, x) to a nescolor.
+def make_image(pixel_func):
+  img = Image.new('RGB', (WIDTH, HEIGHT))
+  img.putdata([to_rgb(pixel_func(y, x))
+               for y in xrange(HEIGHT) for x in xrange(WIDTH)])
+  return img
+
+
+# make_unique_tiles
+#
+# A screen using 256 different tiles with a single full palette. The first
+# row of each tile has its number in binary, so that no two are the same.
+def make_unique_tiles(rand):
+  colors = [BG_COLOR, 0x16, 0x27, 0x30]
+  noise = [rand.randrange(4) for i in xrange(256 * 64)]
+  def pixel(y, x):
+    n = ((y / TILE_SIZE) * NUM_BLOCKS_X * 2 + x / TILE_SIZE) % 256
+    (i, j) = (y % TILE_SIZE, x % TILE_SIZE)
+    if i == 0:
+      return colors[(n >> (7 - j)) & 1]
+    return colors[noise[n * 64 + i * TILE_SIZE + j]]
+  return make_image(pixel)
+
+
+# make_max_palettes
+#
+# A screen using four full palettes, each block using every color of one of
+# them.
+def make_max_palettes(rand):
+  options = [[0x01, 0x11, 0x21], [0x06, 0x16, 0x26], [0x09, 0x19, 0x29],
+             [0x00, 0x10, 0x30]]
+  def pixel(y, x):
+    option = options[(y / BLOCK_SIZE + x / BLOCK_SIZE) % 4]
+    k = (y * 3 + x * 5 + (y / TILE_SIZE) * (x / TILE_SIZE)) % 4
+    return ([BG_COLOR] + option)[k]
+  return make_image(pixel)
+
+
+# make_mergeable
+#
+# A screen with many small color sets, each block using one or two colors
+# out of twelve, which must be merged into four palettes. This exercises the
+# search in guess_best_palette.
+def make_mergeable(rand):
+  groups = [[0x01, 0x11, 0x21], [0x06, 0x16, 0x26], [0x09, 0x19, 0x29],
+            [0x04, 0x14, 0x24]]
+  sets = []
+  for group in groups:
+    sets += [[c] for c in group]
+    sets += [[group[a], group[b]] for (a, b) in [(0, 1), (1, 2), (0, 2)]]
+  choices = [rand.choice(sets)
+             for k in xrange(NUM_BLOCKS_X * NUM_BLOCKS_Y)]
+  def pixel(y, x):
+    color_set = choices[(y / BLOCK_SIZE) * NUM_BLOCKS_X + x / BLOCK_SIZE]
+    if (y + x) % 3 == 0:
+      return BG_COLOR
+    return color_set[(y / 2 + x / 2) % len(color_set)]
+  return make_image(pixel)
+
+
+# make_antialiased
+#
+# A busy screen in which every pixel is off from its nescolor by a small
+# amount, as if it had been scaled or antialiased, so that every color has
+# to be found with the nearest color lookup.
+def make_antialiased(rand):
+  img = make_max_palettes(rand)
+  table = nearest_color.get_table()
+  pixels = []
+  for p in img.getdata():
+    nc = rgb.RGB_XLAT[p[0] * 256 * 256 + p[1] * 256 + p[2]]
+    q = tuple([min(max(v + rand.randint(-6, 6), 0), 255) for v in p])
+    # Keep the exact color if the change would make it a different one.
+    pixels.append(q if table.find(*q) == nc else p)
+  img.putdata(pixels)
+  return img
+
+
+def make_blank(rand):
+  return Image.new('RGB', (WIDTH, HEIGHT), to_rgb(BG_COLOR))
+
+
+IMAGES = [('unique-tiles', make_unique_tiles),
+          ('max-palettes', make_max_palettes),
+          ('mergeable', make_mergeable),
+          ('antialiased', make_antialiased),
+          ('blank', make_blank)]
+
+
+# time_conversion
+#
+# Convert the image once, timing each stage. Returns a dict from stage to
+# seconds.
+#
+# img: The pixel art image.
+# args: Command-line arguments, naming the outputs and views to create.
+def time_conversion(img, args):
+  application = app.Application()
+  processor = image_processor.ImageProcessor()
+  stages = [('load', lambda: processor.load_image(img)),
+            ('scan', lambda: processor.scan_image(img)),
+            ('palette', lambda: processor.process_palette(args.palette)),
+            ('attributes', processor.assign_attributes),
+            ('chr', processor.make_chr),
+            ('output', lambda: application.create_output(processor, args)),
+            ('views', lambda: application.create_views(processor, args, img))]
+  times = {}
+  for (name, func) in stages:
+    start = time.time()
+    func()
+    times[name] = time.time() - start
+    if processor.err().has():
+      raise RuntimeError('Benchmark image failed to convert: %s' %
+                         processor.err().get()[0])
+  return times
+
+
+# run_benchmark
+#
+# Convert each benchmark image several times, keeping the fastest time for
+# each stage. Returns a dict from image name to a dict of stage times.
+#
+# names: Images to run, or None for all of them.
+# repeat: Number of times to convert each image.
+def run_benchmark(names=None, repeat=5):
+  # Load the nearest color table up front, so that it isn't counted.
+  nearest_color.get_table()
+  tmpdir = tempfile.mkdtemp()
+  try:
+    args = makechr.make_parser().parse_args(
+      ['-X', '-o', os.path.join(tmpdir, '%s.dat'),
+       '-c', os.path.join(tmpdir, 'rom.nes')] +
+      sum([['--' + view.replace('_', '-'), os.path.join(tmpdir, view + '.png')]
+           for view in app.VIEW_OPTIONS], []))
+    results = {}
+    for (name, make_func) in IMAGES:
+      if names and not name in names:
+        continue
+      img = make_func(random.Random(name))
+      xlat = dict(rgb.RGB_XLAT)
+      best = None
+      for n in xrange(repeat):
+        # Forget colors found by earlier runs, so that each run does the
+        # same work.
+        rgb.RGB_XLAT.clear()
+        rgb.RGB_XLAT.update(xlat)
+        times = time_conversion(img, args)
+        if best is None:
+          best = times
+        else:
+          best = dict([(k, min(best[k], times[k])) for k in best])
+      best['total'] = sum([best[k] for k in STAGES])
+      results[name] = best
+  finally:
+    shutil.rmtree(tmpdir)
+  return results
+
+
+# find_regressions
+#
+# Compare results with a baseline. Returns a list of (image, stage, baseline
+# seconds, new seconds) for each stage that got slower by more than the
+# threshold.
+def find_regressions(results, baseline, threshold=DEFAULT_THRESHOLD):
+  regressions = []
+  for name in sorted(results):
+    if not name in baseline:
+      continue
+    for stage in STAGES + ['total']:
+      (old, new) = (baseline[name].get(stage), results[name].get(stage))
+      if old is None or new is None or max(old, new) < MIN_SECONDS:
+        continue
+      if new > old * threshold:
+        regressions.append((name, stage, old, new))
+  return regressions
+
+
+def show_results(results):
+  columns = STAGES + ['total']
+  print('{0:<14}'.format('(ms)') +
+        ''.join(['{0:>11}'.format(c) for c in columns]))
+  for name, _ in IMAGES:
+    if name in results:
+      print('{0:<14}'.format(name) +
+            ''.join(['{0:>11.1f}'.format(results[name][c] * 1000)
+                     for c in columns]))
+
+
+def run():
+  parser = argparse.ArgumentParser(description='Time each stage of makechr '
+                                   'on synthetic images')
+  parser.add_argument('images', nargs='*', metavar='image',
+                      help='names of images to run, default is all: ' +
+                      ', '.join([name for name, _ in IMAGES]))
+  parser.add_argument('-n', dest='repeat', type=int, default=5,
+                      help='number of times to convert each image')
+  parser.add_argument('-o', dest='output', metavar='json filename',
+                      help='filename to save results to')
+  parser.add_argument('--compare', dest='compare', metavar='json filename',
+                      help='results of an earlier run to compare against')
+  parser.add_argument('--threshold', dest='threshold', type=float,
+                      default=DEFAULT_THRESHOLD,
+                      help='how much slower a stage must be to be reported')
+  args = parser.parse_args()
+  results = run_benchmark(args.images, args.repeat)
+  show_results(results)
+  if args.output:
+    fout = open(args.output, 'w')
+    json.dump({'version': build_cache.tool_version(),
+               'python': sys.version.split()[0],
+               'repeat': args.repeat,
+               'results': results}, fout, indent=2, sort_keys=True)
+    fout.write('\n')
+    fout.close()
+  if args.compare:
+    fin = open(args.compare, 'r')
+    baseline = json.load(fin)['results']
+    fin.close()
+    regressions = find_regressions(results, baseline, args.threshold)
+    for (name, stage, old, new) in regressions:
+      print('Regression: {0} {1} {2:.1f}ms -> {3:.1f}ms'.format(
+          name, stage, old * 1000, new * 1000))
+    if regressions:
+      sys.exit(1)
+
+
+if __name__ == '__main__':
+  run()
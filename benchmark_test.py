@@ -0,0 +1,33 @@
+import unittest
+
+import benchmark
+import image_processor
+import random
+
+
+class BenchmarkTests(unittest.TestCase):
+  def test_images_convert(self):
+    for (name, make_func) in benchmark.IMAGES:
+      img = make_func(random.Random(name))
+      processor = image_processor.ImageProcessor()
+      processor.process_image(img, None, None)
+      self.assertFalse(processor.err().has(), name)
+      if name == 'unique-tiles':
+        self.assertEqual(len(processor.chr_data()), 256)
+
+  def test_run_benchmark(self):
+    results = benchmark.run_benchmark(['blank'], repeat=1)
+    self.assertEqual(results.keys(), ['blank'])
+    self.assertEqual(sorted(results['blank']),
+                     sorted(benchmark.STAGES + ['total']))
+
+  def test_find_regressions(self):
+    baseline = {'a': {'scan': 0.010, 'chr': 0.0001, 'total': 0.020}}
+    results = {'a': {'scan': 0.020, 'chr': 0.0005, 'total': 0.021},
+               'b': {'scan': 1.0, 'total': 1.0}}
+    self.assertEqual(benchmark.find_regressions(results, baseline),
+                     [('a', 'scan', 0.010, 0.020)])
+
+
+if __name__ == '__main__':
+  unittest.main()
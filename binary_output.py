@@ -1,59 +1,120 @@
+import array
 from constants import *
 
 
+CHR_SIZE = 8192
+CHR_TILE_SIZE = 16
+
+
+# write_file
+#
+# Write data to a file with a single call. Returns whether the file was
+# written.
+#
+# filename: Name of the file.
+# data: Contents of the file, as bytes.
+# only_changed: If set, a file that already holds exactly the data is left
+#               alone, so that its mtime doesn't change.
+def write_file(filename, data, only_changed=False):
+  if only_changed:
+    try:
+      fin = open(filename, 'rb')
+      same = fin.read(len(data) + 1) == data
+      fin.close()
+    except IOError:
+      same = False
+    if same:
+      return False
+  fout = open(filename, 'wb')
+  fout.write(data)
+  fout.close()
+  return True
+
+
 class BinaryOutput(object):
-  def __init__(self, tmpl):
+  # tmpl: Template for naming output files, where "%s" is replaced by the kind
+  #       of output. If None, nothing is written to disk, and the outputs are
+  #       only available from get_product.
+  # only_changed: Whether to leave output files alone if they already hold
+  #               the same bytes.
+  def __init__(self, tmpl=None, only_changed=False):
     self._nametable_cache = {}
     self._tmpl = tmpl
-
-  def pad(self, fout, num, byte_value=0):
-    fout.write(chr(byte_value) * num)
+    self._only_changed = only_changed
+    self._products = {}
+    self._written = []
 
   def fill_template(self, replace):
     return self._tmpl.replace('%s', replace)
 
+  # write_product
+  #
+  # Save a finished output, writing it to its file unless there is no
+  # template.
+  #
+  # kind: Kind of output, such as "chr".
+  # data: Contents of the output, as a bytearray.
+  def write_product(self, kind, data):
+    data = bytes(data)
+    self._products[kind] = data
+    if self._tmpl is None:
+      return
+    if write_file(self.fill_template(kind), data, self._only_changed):
+      self._written.append(kind)
+
+  # get_product
+  #
+  # Get the contents of an output that has been saved, as bytes.
+  #
+  # kind: Kind of output, such as "chr".
+  def get_product(self, kind):
+    return self._products[kind]
+
+  # written
+  #
+  # Get the kinds of output that were written to their files.
+  def written(self):
+    return self._written
+
   def save_nametable(self, artifacts):
-    fout = open(self.fill_template('nametable'), 'wb')
-    for y in xrange(NUM_BLOCKS_Y * 2):
-      for x in xrange(NUM_BLOCKS_X * 2):
-        nt = artifacts[y][x][ARTIFACT_NT]
-        fout.write(chr(nt))
-    fout.close()
+    data = bytearray(array.array('B', artifacts.plane(ARTIFACT_NT)).tostring())
+    self.write_product('nametable', data)
 
   def save_chr(self, chr_data):
-    fout = open(self.fill_template('chr'), 'wb')
-    for d in chr_data:
-      d.write(fout)
-    padding = 8192 - (len(chr_data) * 16)
-    self.pad(fout, padding)
-    fout.close()
+    data = bytearray(max(CHR_SIZE, len(chr_data) * CHR_TILE_SIZE))
+    for k, d in enumerate(chr_data):
+      data[k * CHR_TILE_SIZE:(k + 1) * CHR_TILE_SIZE] = d.get_bytes()
+    self.write_product('chr', data)
 
   def save_palette(self, palette):
-    fout = open(self.fill_template('palette'), 'wb')
     bg_color = palette.bg_color
+    data = bytearray([bg_color] * 32)
     for i in xrange(4):
       palette_option = palette.get(i)
       if palette_option is None:
-        palette_option = [bg_color] * 4
-      for j in xrange(4):
-        if j < len(palette_option):
-          fout.write(chr(palette_option[j]))
-        else:
-          fout.write(chr(bg_color))
-    self.pad(fout, 16, bg_color)
-    fout.close()
+        continue
+      data[i * 4:i * 4 + len(palette_option)] = bytearray(palette_option)
+    self.write_product('palette', data)
+
+  # save_bank
+  #
+  # Save the number of the chr bank that the nametable refers to, as a single
+  # byte.
+  #
+  # bank_num: Number of the bank.
+  def save_bank(self, bank_num):
+    self.write_product('bank', bytearray([bank_num]))
 
   def save_attribute(self, artifacts):
-    fout = open(self.fill_template('attribute'), 'wb')
-    for attr_y in xrange(NUM_BLOCKS_Y / 2):
-      for attr_x in xrange(NUM_BLOCKS_X / 2):
-        y = attr_y * 4
-        x = attr_x * 4
-        p0 = artifacts[y + 0][x + 0][ARTIFACT_PID]
-        p1 = artifacts[y + 0][x + 2][ARTIFACT_PID]
-        p2 = artifacts[y + 2][x + 0][ARTIFACT_PID]
-        p3 = artifacts[y + 2][x + 2][ARTIFACT_PID]
-        attr = p0 + (p1 << 2) + (p2 << 4) + (p3 << 6)
-        fout.write(chr(attr))
-    self.pad(fout, 8)
-    fout.close()
+    # Each attribute byte covers a 2x2 group of blocks. Take the pid of the
+    # top-left tile of each block, then combine each group of four.
+    pids = artifacts.plane(ARTIFACT_PID)
+    width = artifacts.num_tiles_x
+    rows = [pids[y * width:(y + 1) * width:2]
+            for y in xrange(0, artifacts.num_tiles_y, 2)]
+    data = bytearray()
+    for top, bottom in zip(rows[0::2], rows[1::2]):
+      data.extend([p0 + (p1 << 2) + (p2 << 4) + (p3 << 6) for (p0, p1, p2, p3)
+                   in zip(top[0::2], top[1::2], bottom[0::2], bottom[1::2])])
+    data.extend(bytearray(8))
+    self.write_product('attribute', data)
@@ -0,0 +1,62 @@
+import unittest
+
+import artifact_table
+import binary_output
+import chr_tile
+from constants import *
+import os
+import palette
+import shutil
+import tempfile
+
+
+class BinaryOutputTests(unittest.TestCase):
+  def test_in_memory(self):
+    artifacts = artifact_table.ArtifactTable()
+    artifacts.set(0, 1, ARTIFACT_NT, 5)
+    artifacts.set_block(0, 1, ARTIFACT_PID, 2)
+    artifacts.set_block(1, 0, ARTIFACT_PID, 3)
+    tile = chr_tile.ChrTile()
+    tile.set(0, 0, 3)
+    pal = palette.PaletteParser().parse('P/0f-01-02/0f-16/')
+    output = binary_output.BinaryOutput()
+    output.save_nametable(artifacts)
+    output.save_chr([chr_tile.ChrTile(), tile])
+    output.save_palette(pal)
+    output.save_attribute(artifacts)
+    nametable = output.get_product('nametable')
+    self.assertEqual(len(nametable), 960)
+    self.assertEqual(nametable[:3], '\x00\x05\x00')
+    chr_bytes = output.get_product('chr')
+    self.assertEqual(len(chr_bytes), 8192)
+    self.assertEqual(chr_bytes[16:32], '\x80' + '\x00' * 7 + '\x80' + '\x00' * 7)
+    self.assertEqual(output.get_product('palette'),
+                     '\x0f\x01\x02\x0f\x0f\x16\x0f\x0f' + '\x0f' * 24)
+    attribute = output.get_product('attribute')
+    self.assertEqual(len(attribute), 64)
+    self.assertEqual(attribute[0], '\x38')
+
+  def test_chr_tile_bytes(self):
+    tile = chr_tile.ChrTile()
+    tile.set(0, 7, 1)
+    tile.set(7, 0, 2)
+    self.assertEqual(tile.get_bytes(),
+                     bytearray([1] + [0] * 7 + [0] * 7 + [0x80]))
+
+  def test_write_file_only_changed(self):
+    tmpdir = tempfile.mkdtemp()
+    try:
+      filename = os.path.join(tmpdir, 'chr.dat')
+      self.assertTrue(binary_output.write_file(filename, 'abc', True))
+      self.assertFalse(binary_output.write_file(filename, 'abc', True))
+      self.assertTrue(binary_output.write_file(filename, 'ab', True))
+      self.assertTrue(binary_output.write_file(filename, 'ab'))
+      fin = open(filename, 'rb')
+      self.assertEqual(fin.read(), 'ab')
+      fin.close()
+    finally:
+      shutil.rmtree(tmpdir)
+
+
+if __name__ == '__main__':
+  unittest.main()
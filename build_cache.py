@@ -0,0 +1,167 @@
+import binary_output
+import errno
+import glob
+import hashlib
+import os
+import shutil
+import tempfile
+from constants import *
+
+
+# Options that change the contents of the outputs, and so are part of the key.
+KEY_OPTIONS = ['palette', 'palette_search_budget', 'palette_objective',
+               'tile_report']
+
+LOG_FILENAME = 'log.txt'
+
+
+_tool_version = None
+
+
+# tool_version
+#
+# Version of makechr used in cache keys. Includes a digest of the source code,
+# so that changes to makechr never reuse results from a different version.
+def tool_version():
+  global _tool_version
+  if _tool_version is None:
+    digest = hashlib.sha1()
+    src_dir = os.path.dirname(os.path.realpath(__file__))
+    for filename in sorted(glob.glob(os.path.join(src_dir, '*.py'))):
+      fin = open(filename, 'rb')
+      digest.update(fin.read())
+      fin.close()
+    _tool_version = '%s-%s' % (VERSION, digest.hexdigest())
+  return _tool_version
+
+
+# BuildCache
+#
+# Persistent cache of conversion results, keyed on the content of the input
+# image and every option that affects the outputs. Each entry is a directory
+# holding the output files plus the stats that were shown, so that a hit can
+# skip processing the image entirely. The least recently used entries are
+# removed once the cache grows past its maximum size.
+class BuildCache(object):
+  def __init__(self, directory, max_size):
+    self._dir = directory
+    self._max_size = max_size
+    self._written = []
+
+  # key
+  #
+  # Get the cache key for converting the image.
+  #
+  # img: The pixel art image.
+  # args: Command-line arguments.
+  # targets: Dict from kind of output to its filename.
+  def key(self, img, args, targets):
+    rgb_img = img.convert('RGB')
+    digest = hashlib.sha1()
+    digest.update(tool_version())
+    digest.update('\0%dx%d\0' % rgb_img.size)
+    digest.update(rgb_img.tobytes())
+    for name in KEY_OPTIONS:
+      digest.update('\0%s=%r' % (name, getattr(args, name)))
+    digest.update('\0' + ','.join(sorted(targets)))
+    return digest.hexdigest()
+
+  def entry_dir(self, key):
+    return os.path.join(self._dir, key)
+
+  # restore
+  #
+  # Copy outputs from the cache entry to their targets. Returns the log that
+  # was saved with the entry, or None if the key is not in the cache. Outputs
+  # are copied rather than hardlinked so that writing new outputs later can't
+  # modify the cache. Every output is read before any target is written, so
+  # that an incomplete entry leaves the targets alone.
+  #
+  # key: The cache key.
+  # targets: Dict from kind of output to its filename.
+  # only_changed: Whether to leave targets alone if they already hold the
+  #               same bytes.
+  def restore(self, key, targets, only_changed=False):
+    entry = self.entry_dir(key)
+    self._written = []
+    try:
+      fin = open(os.path.join(entry, LOG_FILENAME), 'r')
+      log = fin.read()
+      fin.close()
+      outputs = []
+      for kind, filename in sorted(targets.items()):
+        fin = open(os.path.join(entry, kind), 'rb')
+        outputs.append((filename, fin.read()))
+        fin.close()
+    except IOError as e:
+      if e.errno != errno.ENOENT:
+        raise
+      return None
+    for filename, data in outputs:
+      if binary_output.write_file(filename, data, only_changed=only_changed):
+        self._written.append(filename)
+    # Mark as recently used.
+    os.utime(entry, None)
+    return log
+
+  # written
+  #
+  # Get the filenames of the targets written by the last restore.
+  def written(self):
+    return self._written
+
+  # store
+  #
+  # Save the outputs to a new cache entry, then evict old entries if needed.
+  #
+  # key: The cache key.
+  # targets: Dict from kind of output to its filename.
+  # log: Text to show when the entry is restored.
+  def store(self, key, targets, log):
+    if not os.path.isdir(self._dir):
+      os.makedirs(self._dir)
+    # Build the entry in a temporary directory and rename it, so that other
+    # processes never see a partial entry.
+    tmp_dir = tempfile.mkdtemp(dir=self._dir, prefix='.tmp-')
+    try:
+      for kind, filename in targets.items():
+        shutil.copyfile(filename, os.path.join(tmp_dir, kind))
+      fout = open(os.path.join(tmp_dir, LOG_FILENAME), 'w')
+      fout.write(log)
+      fout.close()
+      os.rename(tmp_dir, self.entry_dir(key))
+    except OSError:
+      # Another process stored the same entry first.
+      pass
+    finally:
+      if os.path.isdir(tmp_dir):
+        shutil.rmtree(tmp_dir)
+    self.evict()
+
+  def entry_size(self, entry):
+    return sum([os.path.getsize(os.path.join(entry, f))
+                for f in os.listdir(entry)])
+
+  # evict
+  #
+  # Remove least recently used entries until the cache is within its
+  # maximum size.
+  def evict(self):
+    entries = []
+    total = 0
+    for name in os.listdir(self._dir):
+      entry = os.path.join(self._dir, name)
+      if name.startswith('.') or not os.path.isdir(entry):
+        continue
+      try:
+        size = self.entry_size(entry)
+        entries.append((os.path.getmtime(entry), size, entry))
+      except OSError:
+        continue
+      total += size
+    entries.sort()
+    for (mtime, size, entry) in entries:
+      if total <= self._max_size:
+        break
+      shutil.rmtree(entry, ignore_errors=True)
+      total -= size
@@ -0,0 +1,90 @@
+import unittest
+
+import build_cache
+import makechr
+import os
+from PIL import Image
+import shutil
+import tempfile
+import time
+
+
+class BuildCacheTests(unittest.TestCase):
+  def setUp(self):
+    self.tmpdir = tempfile.mkdtemp()
+    self.cache_dir = os.path.join(self.tmpdir, 'cache')
+
+  def tearDown(self):
+    shutil.rmtree(self.tmpdir)
+
+  def write_file(self, name, content):
+    filename = os.path.join(self.tmpdir, name)
+    fout = open(filename, 'wb')
+    fout.write(content)
+    fout.close()
+    return filename
+
+  def read_file(self, filename):
+    fin = open(filename, 'rb')
+    content = fin.read()
+    fin.close()
+    return content
+
+  def test_key(self):
+    cache = build_cache.BuildCache(self.cache_dir, 1024)
+    args = makechr.make_parser().parse_args(['-X'])
+    img = Image.new('RGB', (256, 240), (0, 0, 0))
+    key = cache.key(img, args, {'chr': 'chr.dat'})
+    self.assertEqual(key, cache.key(img.convert('P'), args,
+                                    {'chr': 'other.dat'}))
+    self.assertNotEqual(key, cache.key(img, args, {'chr': 'chr.dat',
+                                                   'rom': 'a.nes'}))
+    args.palette = 'P/0f/'
+    self.assertNotEqual(key, cache.key(img, args, {'chr': 'chr.dat'}))
+    img.putpixel((5, 5), (0, 0, 0xfc))
+    args.palette = None
+    self.assertNotEqual(key, cache.key(img, args, {'chr': 'chr.dat'}))
+
+  def test_store_and_restore(self):
+    cache = build_cache.BuildCache(self.cache_dir, 1024)
+    targets = {'chr': self.write_file('chr.dat', 'abc'),
+               'palette': self.write_file('palette.dat', 'def')}
+    self.assertEqual(cache.restore('k', targets), None)
+    cache.store('k', targets, 'stats\n')
+    self.write_file('chr.dat', 'changed')
+    os.remove(targets['palette'])
+    self.assertEqual(cache.restore('k', targets), 'stats\n')
+    self.assertEqual(self.read_file(targets['chr']), 'abc')
+    self.assertEqual(self.read_file(targets['palette']), 'def')
+    self.assertEqual(sorted(cache.written()), sorted(targets.values()))
+
+  def test_restore_only_changed(self):
+    cache = build_cache.BuildCache(self.cache_dir, 1024)
+    targets = {'chr': self.write_file('chr.dat', 'abc'),
+               'palette': self.write_file('palette.dat', 'def')}
+    cache.store('k', targets, 'stats\n')
+    past = int(time.time()) - 100
+    os.utime(targets['chr'], (past, past))
+    self.write_file('palette.dat', 'changed')
+    self.assertEqual(cache.restore('k', targets, only_changed=True), 'stats\n')
+    self.assertEqual(cache.written(), [targets['palette']])
+    self.assertEqual(os.path.getmtime(targets['chr']), past)
+    self.assertEqual(self.read_file(targets['palette']), 'def')
+
+  def test_evict_least_recently_used(self):
+    cache = build_cache.BuildCache(self.cache_dir, 250)
+    targets = {'chr': self.write_file('chr.dat', 'x' * 100)}
+    cache.store('first', targets, '')
+    cache.store('second', targets, '')
+    past = time.time() - 100
+    os.utime(cache.entry_dir('first'), (past, past))
+    os.utime(cache.entry_dir('second'), (past + 1, past + 1))
+    self.assertEqual(cache.restore('first', targets), '')
+    cache.store('third', targets, '')
+    self.assertTrue(os.path.isdir(cache.entry_dir('first')))
+    self.assertFalse(os.path.isdir(cache.entry_dir('second')))
+    self.assertTrue(os.path.isdir(cache.entry_dir('third')))
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,84 @@
+import binary_output
+import errors
+
+
+BANK_TILES = 256
+
+
+# ChrBank
+#
+# Chr shared by a series of screens, so that a tile used by many screens is
+# only stored once. Screens are added one at a time, and adding a screen only
+# looks up its own tiles, never those of earlier screens. Since a screen can
+# only use a single bank at once, all of its tiles must fit in the same bank.
+# When a screen doesn't fit in any bank so far, a new bank is started.
+class ChrBank(object):
+  # num_banks: Maximum number of banks, or None for a single bank without
+  #            any size limit.
+  def __init__(self, num_banks=None):
+    self._num_banks = num_banks
+    self._banks = []
+
+  # fits
+  #
+  # Whether the tiles fit in the bank, counting those already in it.
+  def fits(self, n, tiles):
+    if self._num_banks is None:
+      return True
+    (bank_tiles, index) = self._banks[n]
+    new = [t for t in tiles if not t in index]
+    return len(bank_tiles) + len(new) <= BANK_TILES
+
+  # add_screen
+  #
+  # Add the tiles of a screen to the first bank that can hold them all.
+  # Returns the number of the bank, and the position in that bank of each
+  # tile. Raises ChrBankOverflowError if no bank can hold them.
+  #
+  # tiles: List of unique ChrTiles used by the screen.
+  def add_screen(self, tiles):
+    for n in xrange(len(self._banks)):
+      if self.fits(n, tiles):
+        break
+    else:
+      n = len(self._banks)
+      if self._num_banks is not None and (n >= self._num_banks or
+                                          len(tiles) > BANK_TILES):
+        raise errors.ChrBankOverflowError(len(tiles), self._num_banks)
+      self._banks.append(([], {}))
+    (bank_tiles, index) = self._banks[n]
+    nt_nums = []
+    for tile in tiles:
+      nt_num = index.get(tile)
+      if nt_num is None:
+        nt_num = len(bank_tiles)
+        index[tile] = nt_num
+        bank_tiles.append(tile)
+      nt_nums.append(nt_num)
+    return n, nt_nums
+
+  # tiles
+  #
+  # Get the tiles in a bank.
+  #
+  # n: Number of the bank.
+  def tiles(self, n):
+    return self._banks[n][0]
+
+  def num_banks(self):
+    return len(self._banks)
+
+  def num_tiles(self):
+    return sum([len(bank_tiles) for (bank_tiles, index) in self._banks])
+
+  # get_bytes
+  #
+  # Get the chr of every bank, each padded to its full size, one after the
+  # other.
+  def get_bytes(self):
+    data = []
+    for n in xrange(len(self._banks)):
+      output = binary_output.BinaryOutput()
+      output.save_chr(self.tiles(n))
+      data.append(output.get_product('chr'))
+    return ''.join(data)
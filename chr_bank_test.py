@@ -0,0 +1,51 @@
+import unittest
+
+import chr_bank
+import chr_tile
+import errors
+
+
+class ChrBankTests(unittest.TestCase):
+  def make_tiles(self, start, count):
+    return [chr_tile.ChrTile(('%032x' % n).decode('hex'))
+            for n in xrange(start, start + count)]
+
+  def test_shared_tiles(self):
+    bank = chr_bank.ChrBank(1)
+    self.assertEqual(bank.add_screen(self.make_tiles(0, 3)), (0, [0, 1, 2]))
+    self.assertEqual(bank.add_screen(self.make_tiles(2, 3)), (0, [2, 3, 4]))
+    self.assertEqual(bank.num_tiles(), 5)
+    self.assertEqual(bank.tiles(0), self.make_tiles(0, 5))
+    self.assertEqual(len(bank.get_bytes()), 8192)
+
+  def test_overflow(self):
+    bank = chr_bank.ChrBank(1)
+    bank.add_screen(self.make_tiles(0, 200))
+    with self.assertRaises(errors.ChrBankOverflowError):
+      bank.add_screen(self.make_tiles(150, 107))
+    # The failed screen doesn't add anything.
+    self.assertEqual(bank.num_tiles(), 200)
+    self.assertEqual(bank.add_screen(self.make_tiles(150, 106))[0], 0)
+
+  def test_spill(self):
+    bank = chr_bank.ChrBank(2)
+    bank.add_screen(self.make_tiles(0, 200))
+    self.assertEqual(bank.add_screen(self.make_tiles(100, 200)),
+                     (1, range(200)))
+    # Screens go in the first bank with room for them.
+    self.assertEqual(bank.add_screen(self.make_tiles(0, 10)),
+                     (0, range(10)))
+    self.assertEqual(bank.num_banks(), 2)
+    self.assertEqual(len(bank.get_bytes()), 16384)
+    with self.assertRaises(errors.ChrBankOverflowError):
+      bank.add_screen(self.make_tiles(1000, 100))
+
+  def test_unlimited(self):
+    bank = chr_bank.ChrBank()
+    bank.add_screen(self.make_tiles(0, 300))
+    self.assertEqual(bank.num_banks(), 1)
+    self.assertEqual(bank.num_tiles(), 300)
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -1,28 +1,71 @@
+# For each group of four pixels, packed two bits each with the leftmost pixel
+# in the highest bits, the matching nibbles of the low and high bit planes.
+NIBBLES = [(((p >> 6 & 1) << 3) | ((p >> 4 & 1) << 2) | ((p >> 2 & 1) << 1) |
+            (p & 1),
+            ((p >> 7 & 1) << 3) | ((p >> 5 & 1) << 2) | ((p >> 3 & 1) << 1) |
+            (p >> 1 & 1))
+           for p in xrange(256)]
+
+
+# ChrTile
+#
+# A single 8x8 tile of chr, stored as its 16 bytes in the format used by chr
+# rom: the low bit plane, then the high bit plane. Tiles with the same pixels
+# are equal and have the same hash, so they can be deduplicated using a dict.
 class ChrTile(object):
-  def __init__(self):
-    self.low = [0] * 8
-    self.hi = [0] * 8
+  def __init__(self, data=None):
+    self.data = data or ('\x00' * 16)
+
+  def __eq__(self, other):
+    return isinstance(other, ChrTile) and self.data == other.data
+
+  def __ne__(self, other):
+    return not self == other
+
+  def __hash__(self):
+    return hash(self.data)
 
   def set(self, y, x, val):
-    low_bit = val & 1
-    hi_bit = val >> 1 & 1
-    self.set_low(low_bit, y, x)
-    self.set_hi(hi_bit, y, x)
+    data = bytearray(self.data)
+    data[y] |= (val & 1) << (7 - x)
+    data[y + 8] |= (val >> 1 & 1) << (7 - x)
+    self.data = bytes(data)
 
   def get(self, y, x):
     mask = 1 << (7 - x)
-    low_bit = 1 if self.low[y] & mask else 0
-    hi_bit = 1 if self.hi[y] & mask else 0
+    low_bit = 1 if ord(self.data[y]) & mask else 0
+    hi_bit = 1 if ord(self.data[y + 8]) & mask else 0
     return low_bit + hi_bit * 2
 
-  def set_low(self, bit, index, offset):
-    self.low[index] |= (bit << (7 - offset))
-
-  def set_hi(self, bit, index, offset):
-    self.hi[index] |= (bit << (7 - offset))
+  # get_bytes
+  #
+  # Get the 16 bytes of the tile.
+  def get_bytes(self):
+    return self.data
 
   def write(self, fp):
-    for b in self.low:
-      fp.write(chr(b))
-    for b in self.hi:
-      fp.write(chr(b))
+    fp.write(self.data)
+
+
+# from_dot_profile
+#
+# Make the tile for a dot profile, once its dots have been assigned to
+# positions in a palette option. Builds both bit planes from a lookup for each
+# half row, instead of setting one pixel at a time.
+#
+# dot_profile: List of 64 dots, each an index into xlat.
+# xlat: List mapping each dot to its value in the tile, 0..3.
+def from_dot_profile(dot_profile, xlat):
+  pixels = [xlat[d] for d in dot_profile]
+  low = bytearray(8)
+  hi = bytearray(8)
+  for row in xrange(8):
+    k = row * 8
+    (low_left, hi_left) = NIBBLES[(pixels[k] << 6) | (pixels[k + 1] << 4) |
+                                  (pixels[k + 2] << 2) | pixels[k + 3]]
+    (low_right, hi_right) = NIBBLES[(pixels[k + 4] << 6) |
+                                    (pixels[k + 5] << 4) |
+                                    (pixels[k + 6] << 2) | pixels[k + 7]]
+    low[row] = (low_left << 4) | low_right
+    hi[row] = (hi_left << 4) | hi_right
+  return ChrTile(bytes(low + hi))
@@ -0,0 +1,31 @@
+import unittest
+
+import chr_tile
+
+
+class ChrTileTests(unittest.TestCase):
+  def test_from_dot_profile(self):
+    dot_profile = ([0, 1, 2, 3] * 2 + [3, 2, 1, 0] * 2) * 4
+    xlat = [0, 2, 1, 3]
+    tile = chr_tile.from_dot_profile(dot_profile, xlat)
+    expect = chr_tile.ChrTile()
+    for y in xrange(8):
+      for x in xrange(8):
+        expect.set(y, x, xlat[dot_profile[y * 8 + x]])
+    self.assertEqual(tile.get_bytes(), expect.get_bytes())
+    self.assertEqual(tile.get(0, 1), 2)
+    self.assertEqual(tile.get(1, 0), 3)
+
+  def test_equality(self):
+    dot_profile = [0] * 32 + [1] * 32
+    a = chr_tile.from_dot_profile(dot_profile, [0, 1])
+    b = chr_tile.from_dot_profile(dot_profile, [0, 1])
+    c = chr_tile.from_dot_profile(dot_profile, [0, 2])
+    self.assertEqual(a, b)
+    self.assertEqual(hash(a), hash(b))
+    self.assertNotEqual(a, c)
+    self.assertEqual(len(set([a, b, c])), 2)
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,58 @@
+# Color sets as bitmasks. Since nescolors are 0..63, any set of them fits in
+# a single integer, with bit n set if nescolor n is in the set. Subset tests,
+# merges and intersections are then single integer operations.
+
+
+# to_mask
+#
+# Get the bitmask for a list of nescolors, ignoring any None elements.
+#
+# colors: Iterable of nescolors.
+def to_mask(colors):
+  mask = 0
+  for c in colors:
+    if not c is None:
+      mask |= 1 << c
+  return mask
+
+
+# to_colors
+#
+# Get the nescolors in a bitmask, sorted in descending order.
+#
+# mask: Bitmask of nescolors.
+def to_colors(mask):
+  colors = []
+  while mask:
+    c = mask.bit_length() - 1
+    colors.append(c)
+    mask ^= 1 << c
+  return colors
+
+
+# count
+#
+# Number of nescolors in a bitmask.
+#
+# mask: Bitmask of nescolors.
+def count(mask):
+  return bin(mask).count('1')
+
+
+# is_subset
+#
+# Return whether every nescolor in subject is also in target.
+#
+# subject: Bitmask of nescolors.
+# target: Bitmask of nescolors.
+def is_subset(subject, target):
+  return subject & ~target == 0
+
+
+# lowest
+#
+# Get the smallest nescolor in a non-empty bitmask.
+#
+# mask: Bitmask of nescolors.
+def lowest(mask):
+  return (mask & -mask).bit_length() - 1
@@ -1,3 +1,5 @@
+VERSION = '0.1'
+
 WIDTH = 256
 HEIGHT = 240
 BLOCK_SIZE = 16
@@ -8,8 +10,9 @@ NUM_BLOCKS_Y = HEIGHT / BLOCK_SIZE
 ARTIFACT_CID = 0
 ARTIFACT_DID = 1
 ARTIFACT_BCID = 2
-ARTIFACT_PID = 2
-ARTIFACT_NT = 3
+ARTIFACT_PID = 3
+ARTIFACT_NT = 4
+ARTIFACT_ERR = 5
 
 NUM_ALLOWED_PALETTES = 4
 PALETTE_SIZE = 4
@@ -70,9 +70,10 @@ class ColorNotAllowedError(Exception):
 
 
 class TooManyPalettesError(Exception):
-  def __init__(self, colors, to_merge=None):
+  def __init__(self, colors, to_merge=None, budget=None):
     self.colors = colors
     self.to_merge = to_merge
+    self.budget = budget
 
   def to_text(self, colors):
     return '/'.join(['-'.join(['%02x' % c for c in row]) for row in colors])
@@ -81,9 +82,22 @@ class TooManyPalettesError(Exception):
     text = self.to_text(self.colors)
     if self.to_merge:
       text = text + ',MERGE={' + self.to_text(self.to_merge) + '}'
+    if self.budget:
+      text = text + (' (gave up after palette search budget of %d steps)' %
+                     self.budget)
     return text
 
 
+class ChrBankOverflowError(Exception):
+  def __init__(self, num_tiles, num_banks):
+    self.num_tiles = num_tiles
+    self.num_banks = num_banks
+
+  def __str__(self):
+    return 'Needs %d tiles, which do not fit in any of %d chr bank%s' % (
+      self.num_tiles, self.num_banks, 's'[self.num_banks == 1:])
+
+
 class ErrorCollector(object):
   def __init__(self):
     self.e = []
@@ -1,108 +1,238 @@
+import color_mask
 import errors
 import rgb
 import palette
-import partitions
 from constants import *
 
 
+# Maximum number of valid palettes to compare when choosing the best one.
+MAX_SCORED_PALETTES = 1000
+
+
+class SearchBudgetExceeded(Exception):
+  pass
+
+
 class GuessBestPalette(object):
 
+  # search_budget: Maximum number of steps to spend searching for a way to
+  #                merge color sets, or None for no limit.
+  def __init__(self, search_budget=None):
+    self._search_budget = search_budget
+    self._nodes = 0
+
+  # nodes_explored
+  #
+  # Number of steps spent by the most recent search.
+  def nodes_explored(self):
+    return self._nodes
+
   # to_color_set
   #
-  # Given a string, often from a hash table key, parse it to make a sorted
-  # color set, without any None elements. The order is descending, making it
-  # easy to do subset comparisions later.
+  # Given a list of color needs, make a color set bitmask, without any None
+  # elements.
   #
-  # text: A text representation of a color set. Example: '[45, 15, 8, None]'
+  # color_needs: List of nescolors, with unused entries as None. Example:
+  #              [45, 15, 8, None]
   def to_color_set(self, color_needs):
-    return sorted([e for e in color_needs if not e is None], reverse=True)
+    return color_mask.to_mask(color_needs)
 
   # is_color_subset
   #
-  # Return whether subject is a strict subset of target.
+  # Return whether subject is a subset of target.
   #
-  # subject: A color set.
-  # target: A color set.
+  # subject: A color set bitmask.
+  # target: A color set bitmask.
   def is_color_subset(self, subject, target):
-    return set(subject) <= set(target)
+    return subject & ~target == 0
 
   # get_uniq_color_sets
   #
-  # Given a color manifest, remove duplicates and sort.
+  # Given a color manifest, remove duplicates and sort. The order is the same
+  # as sorting lists of each color set's colors in descending order.
   #
-  # color_manifest: A dict of color sets.
+  # color_manifest: A list of color needs.
   def get_uniq_color_sets(self, color_manifest):
-    seen = {}
+    seen = set()
     for color_needs in color_manifest:
-      color_set = self.to_color_set(color_needs)
-      name = '-'.join(['%02x' % e for e in color_set])
-      seen[name] = color_set
-    return sorted(seen.values())
+      seen.add(self.to_color_set(color_needs))
+    return sorted(seen, key=color_mask.to_colors)
 
+  # get_minimal_colors
+  #
+  # Remove every color set that is a subset of another one, keeping the rest
+  # in order. Instead of comparing each pair of color sets, every proper
+  # subset of each color set is marked as dominated. Color sets have at most
+  # PALETTE_SIZE colors, so they have only a few subsets each, and this takes
+  # time proportional to the number of color sets. Any larger color set is
+  # compared against the others directly.
+  #
+  # uniq_color_sets: List of unique color set bitmasks.
   def get_minimal_colors(self, uniq_color_sets):
-    minimized = []
-    for i, color_set in enumerate(uniq_color_sets):
-      for j, target in enumerate(uniq_color_sets[i + 1:]):
-        if self.is_color_subset(color_set, target):
-          break
-      else:
-        minimized.append(color_set)
-    return minimized
-
-  def merge_color_sets(self, color_set_collection, merge_strategy):
-    result = []
-    for choices in merge_strategy:
-      merged = set()
-      for c in choices:
-        merged |= set(color_set_collection[c])
-      if len(merged) > PALETTE_SIZE:
-        return None
-      result.append(merged)
-    return result
+    dominated = set()
+    for color_set in uniq_color_sets:
+      if color_set in dominated:
+        # Its subsets are already marked, by a superset.
+        continue
+      if color_mask.count(color_set) > PALETTE_SIZE:
+        for target in uniq_color_sets:
+          if target != color_set and self.is_color_subset(target, color_set):
+            dominated.add(target)
+        continue
+      subset = color_set
+      while subset:
+        subset = (subset - 1) & color_set
+        dominated.add(subset)
+    return [c for c in uniq_color_sets if not c in dominated]
+
+  # merge_color_sets
+  #
+  # Get the colors of a PaletteOption made by merging a group of color sets.
+  # The colors are collected one color set at a time into a python set, which
+  # lists them in the same order as earlier versions of makechr, so guessed
+  # palettes don't change.
+  #
+  # color_sets: List of color set bitmasks.
+  # group: Indexes of the color sets to merge, ascending.
+  def merge_color_sets(self, color_sets, group):
+    merged = set()
+    for c in group:
+      merged |= set(color_mask.to_colors(color_sets[c]))
+    return list(merged)
 
   # get_background_color
   #
   # Given a list of colors, return the best background color. Prefer
   # black if possible, otherwise, use the smallest numerical value.
   #
-  # combined_colors: List of color needs.
+  # combined_colors: List of color set bitmasks.
   def get_background_color(self, combined_colors):
-    possibilities = set(combined_colors[0])
+    possibilities = combined_colors[0]
     for color_set in combined_colors[1:]:
-      possibilities = possibilities & set(color_set)
-    if rgb.BLACK in possibilities:
+      possibilities &= color_set
+    if possibilities & (1 << rgb.BLACK):
       return rgb.BLACK
     if possibilities:
-      return min(possibilities)
+      return color_mask.lowest(possibilities)
     return None
 
+  def to_color_lists(self, color_sets):
+    return [color_mask.to_colors(c) for c in color_sets]
+
   # get_valid_combinations
   #
   # Some of the color_sets are finalized (full PaletteOptions) the others
-  # remaining need to be merged. Try all possible combinations, and for each
-  # one determine the background color. Return all possibilities, at least 1.
+  # remaining need to be merged. Search lazily for ways to merge them, each
+  # partition of the remaining sets in turn, and determine the background
+  # color for each. Return a list of the first possibilities found, at most
+  # limit. Running out of search budget is only an error if nothing was found.
   #
-  # finalized: Full color sets.
-  # remaining: Color sets that need to be merged.
-  def get_valid_combinations(self, finalized, remaining):
-    merged_color_possibilities = []
+  # finalized: Full color set bitmasks.
+  # remaining: Color set bitmasks that need to be merged.
+  # limit: Maximum number of possibilities to find.
+  def get_valid_combinations(self, finalized, remaining, limit=1):
     num_available = NUM_ALLOWED_PALETTES - len(finalized)
-    for merge_strategy in partitions.partitions(len(remaining)):
-      if len(merge_strategy) > num_available:
-        continue
-      merged_colors = self.merge_color_sets(remaining, merge_strategy)
-      if not merged_colors:
-        continue
-      combined_colors = finalized + merged_colors
-      bg_color = self.get_background_color(combined_colors)
-      if bg_color is None:
-        continue
-      merged_color_possibilities.append([bg_color, combined_colors])
-    if not len(merged_color_possibilities):
-      raise errors.TooManyPalettesError(finalized, to_merge=remaining)
-    return merged_color_possibilities
+    bg_colors = None
+    for color_set in finalized:
+      bg_colors = self.intersect(bg_colors, color_set)
+    self._nodes = 0
+    search = self.generate_groups(remaining, range(len(remaining)), bg_colors,
+                                  num_available)
+    found = []
+    try:
+      for groups in search:
+        found.append(groups)
+        if len(found) >= limit:
+          break
+    except SearchBudgetExceeded:
+      if not found:
+        raise errors.TooManyPalettesError(self.to_color_lists(finalized),
+                                          self.to_color_lists(remaining),
+                                          budget=self._search_budget)
+    if not found:
+      raise errors.TooManyPalettesError(self.to_color_lists(finalized),
+                                        self.to_color_lists(remaining))
+    return [self.to_possibility(finalized, remaining, g) for g in found]
+
+  def to_possibility(self, finalized, remaining, groups):
+    merged = []
+    for group in groups:
+      mask = 0
+      for c in group:
+        mask |= remaining[c]
+      merged.append(mask)
+    bg_color = self.get_background_color(finalized + merged)
+    combined_colors = (self.to_color_lists(finalized) +
+                       [self.merge_color_sets(remaining, g) for g in groups])
+    return [bg_color, combined_colors]
 
-  def get_merged_color_possibilities(self, minimal_colors):
+  def intersect(self, bg_colors, color_set):
+    if bg_colors is None:
+      return color_set
+    return bg_colors & color_set
+
+  # generate_groups
+  #
+  # Backtracking search that splits items into groups that can each be merged
+  # into a single PaletteOption. A group is abandoned as soon as it has too
+  # many colors, or shares no background color with the other groups, and
+  # no more than num_available groups are made. Generates each valid way to
+  # split the items, as a list of groups, each a list of items.
+  #
+  # color_sets: Color sets that need to be merged.
+  # items: Indexes into color_sets of the items to split, ascending.
+  # bg_colors: Possible background colors, or None if not yet constrained.
+  # num_available: Number of groups that can still be made.
+  def generate_groups(self, color_sets, items, bg_colors, num_available):
+    if not items:
+      yield []
+      return
+    # Every group holds the background color plus at most PALETTE_SIZE - 1
+    # other colors, which gives a lower bound on the number of groups needed.
+    all_colors = 0
+    for i in items:
+      all_colors |= color_sets[i]
+    needed = ((color_mask.count(all_colors) - 1 + PALETTE_SIZE - 2) /
+              (PALETTE_SIZE - 1))
+    if max(needed, 1) > num_available:
+      return
+    # The last item always starts the next group.
+    last = items[-1]
+    for groups in self.grow_group(color_sets, items, len(items) - 2, [last],
+                                  color_sets[last], bg_colors, [],
+                                  num_available):
+      yield groups
+
+  # grow_group
+  #
+  # Decide whether items[k] joins the group, then continue with the item
+  # before it. Joining is tried first. Once every item has been decided, the
+  # items left out are split into more groups. Each call counts against the
+  # search budget.
+  def grow_group(self, color_sets, items, k, group, merged, bg_colors, rest,
+                 num_available):
+    self._nodes += 1
+    if self._search_budget and self._nodes > self._search_budget:
+      raise SearchBudgetExceeded()
+    if k < 0:
+      group_bg_colors = self.intersect(bg_colors, merged)
+      if not group_bg_colors:
+        return
+      for tail in self.generate_groups(color_sets, rest, group_bg_colors,
+                                       num_available - 1):
+        yield [sorted(group)] + tail
+      return
+    item = items[k]
+    joined = merged | color_sets[item]
+    if color_mask.count(joined) <= PALETTE_SIZE:
+      for groups in self.grow_group(color_sets, items, k - 1, group + [item],
+                                    joined, bg_colors, rest, num_available):
+        yield groups
+    for groups in self.grow_group(color_sets, items, k - 1, group, merged,
+                                  bg_colors, [item] + rest, num_available):
+      yield groups
+
+  def get_merged_color_possibilities(self, minimal_colors, limit=1):
     finalized = []
     remaining = []
     # We know from earlier steps that minimal_colors is a set of color_sets
@@ -110,37 +240,57 @@ class GuessBestPalette(object):
     # colors in common such that they could be merged. First, let's remove all
     # full palettes, leaving only those that might be mergable.
     for color_set in minimal_colors:
-      if len(color_set) == PALETTE_SIZE:
+      if color_mask.count(color_set) == PALETTE_SIZE:
         finalized.append(color_set)
       else:
         remaining.append(color_set)
     if remaining:
       # There are remaining unmerged palettes. Generate all valid combinations
       # of merged palettes, which may fail if there is no way to merge them.
-      return self.get_valid_combinations(finalized, remaining)
+      return self.get_valid_combinations(finalized, remaining, limit)
     elif len(finalized) > NUM_ALLOWED_PALETTES:
       # The number of necessary palettes is more than the number allowed.
-      raise errors.TooManyPalettesError(minimal_colors)
+      raise errors.TooManyPalettesError(self.to_color_lists(minimal_colors))
     else:
       # There is only one valid combination.
       bg_color = self.get_background_color(finalized)
-      return [[bg_color, finalized]]
+      return [[bg_color, self.to_color_lists(finalized)]]
 
   # get_palette
   #
-  # Given list of possible palettes, just pick and build the first one.
+  # Given list of possible palettes, build the first one, or if there is a
+  # scorer, the one with the lowest score.
   #
   # possibilities: List of possible palettes, must have at least one element.
-  def get_palette(self, possibilities):
-    (bg_color, color_set_collection) = possibilities[0]
-    pal = palette.Palette()
-    pal.set_bg_color(bg_color)
-    for color_set in color_set_collection:
-      pal.add(color_set)
-    return pal
-
-  def make_palette(self, color_needs_list):
+  # scorer: Optional object whose score method rates a Palette, lower is
+  #         better. Ties go to the earlier palette.
+  def get_palette(self, possibilities, scorer=None):
+    best = None
+    best_score = None
+    for (bg_color, color_set_collection) in possibilities:
+      pal = palette.Palette()
+      pal.set_bg_color(bg_color)
+      for color_set in color_set_collection:
+        pal.add(color_set)
+      if scorer is None:
+        return pal
+      score = scorer.score(pal)
+      if best is None or score < best_score:
+        best = pal
+        best_score = score
+    return best
+
+  # make_palette
+  #
+  # Make a palette that fits all of the color needs.
+  #
+  # color_needs_list: List of color needs, one for each block.
+  # scorer: Optional object that rates palettes. If given, up to
+  #         MAX_SCORED_PALETTES valid palettes are compared, instead of just
+  #         using the first one found.
+  def make_palette(self, color_needs_list, scorer=None):
     uniq_color_sets = self.get_uniq_color_sets(color_needs_list)
     minimal_colors = self.get_minimal_colors(uniq_color_sets)
-    possibilities = self.get_merged_color_possibilities(minimal_colors)
-    return self.get_palette(possibilities)
+    limit = MAX_SCORED_PALETTES if scorer else 1
+    possibilities = self.get_merged_color_possibilities(minimal_colors, limit)
+    return self.get_palette(possibilities, scorer)
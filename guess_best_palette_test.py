@@ -0,0 +1,81 @@
+import unittest
+
+import errors
+import guess_best_palette
+
+
+class GuessBestPaletteTests(unittest.TestCase):
+  def make_palette(self, color_sets, search_budget=None):
+    color_needs_list = [c + [None] * (4 - len(c)) for c in color_sets]
+    guesser = guess_best_palette.GuessBestPalette(search_budget)
+    return str(guesser.make_palette(color_needs_list))
+
+  def test_uniq_color_sets(self):
+    guesser = guess_best_palette.GuessBestPalette()
+    uniq = guesser.get_uniq_color_sets([[0x0f, 0x01, None, None],
+                                        [0x16, 0x0f, None, None],
+                                        [0x01, 0x0f, None, None],
+                                        [0x0f, None, None, None]])
+    self.assertEqual(guesser.to_color_lists(uniq),
+                     [[0x0f], [0x0f, 0x01], [0x16, 0x0f]])
+
+  def test_minimal_colors(self):
+    guesser = guess_best_palette.GuessBestPalette()
+    uniq = guesser.get_uniq_color_sets([[0x0f, 0x01, 0x11, None],
+                                        [0x0f, 0x01, None, None],
+                                        [0x11, None, None, None],
+                                        [0x0f, 0x16, None, None],
+                                        [0x16, 0x26, 0x36, None],
+                                        [0x26, 0x36, None, None]])
+    minimal = guesser.get_minimal_colors(uniq)
+    self.assertEqual(guesser.to_color_lists(minimal),
+                     [[0x11, 0x0f, 0x01], [0x16, 0x0f], [0x36, 0x26, 0x16]])
+
+  def test_full_palettes(self):
+    self.assertEqual(self.make_palette([[0x0f, 0x01, 0x11, 0x21],
+                                        [0x0f, 0x16, 0x26, 0x36]]),
+                     'P/0f-21-11-01/0f-36-26-16/')
+
+  def test_merge_subsets(self):
+    self.assertEqual(self.make_palette([[0x0f, 0x01], [0x0f, 0x01, 0x11],
+                                        [0x0f, 0x16], [0x0f]]),
+                     'P/0f-11-16-01/')
+
+  def test_merge_many_small_sets(self):
+    color_sets = [[0x0f, c] for c in xrange(0x01, 0x0d)]
+    self.assertEqual(self.make_palette(color_sets),
+                     'P/0f-0a-0b-0c/0f-08-09-07/0f-04-05-06/0f-01-02-03/')
+
+  def test_too_many_colors(self):
+    color_sets = [[0x0f, c] for c in xrange(0x01, 0x11)]
+    with self.assertRaises(errors.TooManyPalettesError):
+      self.make_palette(color_sets)
+
+  def test_no_common_background(self):
+    with self.assertRaises(errors.TooManyPalettesError):
+      self.make_palette([[0x0f, 0x01, 0x11], [0x30, 0x16, 0x26]])
+
+  def test_search_budget(self):
+    color_sets = [[0x0f, c] for c in xrange(0x01, 0x0d)]
+    with self.assertRaises(errors.TooManyPalettesError) as cm:
+      self.make_palette(color_sets, search_budget=10)
+    self.assertEqual(cm.exception.budget, 10)
+    self.assertTrue('budget of 10 steps' in str(cm.exception))
+    self.assertEqual(self.make_palette(color_sets, search_budget=1000),
+                     'P/0f-0a-0b-0c/0f-08-09-07/0f-04-05-06/0f-01-02-03/')
+
+  def test_scorer(self):
+    class MostPalettesScorer(object):
+      def score(self, pal):
+        return -len(pal.pals)
+    color_needs_list = [[0x0f, 0x01, None, None], [0x0f, 0x02, None, None]]
+    guesser = guess_best_palette.GuessBestPalette()
+    self.assertEqual(str(guesser.make_palette(color_needs_list)),
+                     'P/0f-01-02/')
+    self.assertEqual(str(guesser.make_palette(color_needs_list,
+                                              MostPalettesScorer())),
+                     'P/0f-02/0f-01/')
+
+
+if __name__ == '__main__':
+  unittest.main()
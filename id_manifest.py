@@ -1,23 +1,88 @@
+# default_key
+#
+# Get the dict key for an object. Lists become tuples and sets become
+# frozensets, which can be hashed directly instead of formatted as strings.
+#
+# obj: The object to get the key of.
+def default_key(obj):
+  if isinstance(obj, list):
+    return tuple(obj)
+  if isinstance(obj, (set, frozenset)):
+    return frozenset(obj)
+  return obj
+
+
 class IdManifest(object):
-  def __init__(self):
+  # key: Function that turns an object into a hashable key. Objects with equal
+  #      keys share an id.
+  def __init__(self, key=default_key):
     self._dict = {}
     self._elems = []
+    self._key = key
+    self._refs = None
 
   def id(self, obj):
-    key = str(obj)
-    if key in self._dict:
-      result = self._dict[key]
-    else:
-      result = len(self._dict)
+    key = self._key(obj)
+    result = self._dict.get(key)
+    if result is None:
+      result = len(self._elems)
       self._dict[key] = result
       self._elems.append(obj)
     return result
 
+  # ids
+  #
+  # Get the id of each object, in a single pass.
+  #
+  # objs: Iterable of objects.
+  def ids(self, objs):
+    lookup = self._dict
+    key_func = self._key
+    result = []
+    for obj in objs:
+      key = key_func(obj)
+      n = lookup.get(key)
+      if n is None:
+        n = len(self._elems)
+        lookup[key] = n
+        self._elems.append(obj)
+      result.append(n)
+    return result
+
   def get(self, id):
     return self._elems[id]
 
   def elems(self):
     return self._elems
 
+  # size
+  #
+  # Get the number of distinct objects. Once references are counted, this
+  # only counts those that are still referenced.
   def size(self):
-    return len(self._dict)
+    if self._refs is None:
+      return len(self._dict)
+    return len(self._refs) - self._refs.count(0)
+
+  # count_refs
+  #
+  # Start counting references to each id, so that objects which are no
+  # longer used can be told apart from the rest. Ids stay the same even
+  # when nothing references them.
+  #
+  # ids: Every reference to an id so far, with repeats.
+  def count_refs(self, ids):
+    self._refs = [0] * len(self._elems)
+    for n in ids:
+      self._refs[n] += 1
+
+  def add_ref(self, id):
+    if id >= len(self._refs):
+      self._refs.extend([0] * (id + 1 - len(self._refs)))
+    self._refs[id] += 1
+
+  def release(self, id):
+    self._refs[id] -= 1
+
+  def refs(self, id):
+    return self._refs[id]
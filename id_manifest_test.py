@@ -0,0 +1,36 @@
+import unittest
+
+import id_manifest
+
+
+class IdManifestTests(unittest.TestCase):
+  def test_default_key(self):
+    manifest = id_manifest.IdManifest()
+    self.assertEqual(manifest.id([1, 2, None]), 0)
+    self.assertEqual(manifest.id([3]), 1)
+    self.assertEqual(manifest.id([1, 2, None]), 0)
+    self.assertEqual(manifest.id(set([5, 6])), 2)
+    self.assertEqual(manifest.id(set([6, 5])), 2)
+    self.assertEqual(manifest.get(1), [3])
+    self.assertEqual(manifest.size(), 3)
+
+  def test_ids(self):
+    manifest = id_manifest.IdManifest(key=tuple)
+    self.assertEqual(manifest.ids([[1], [2], [1], [3]]), [0, 1, 0, 2])
+    self.assertEqual(manifest.id([2]), 1)
+    self.assertEqual(manifest.elems(), [[1], [2], [3]])
+
+  def test_refs(self):
+    manifest = id_manifest.IdManifest(key=tuple)
+    manifest.ids([[1], [2], [1], [3]])
+    manifest.count_refs([0, 1, 0, 2])
+    self.assertEqual(manifest.refs(0), 2)
+    manifest.release(1)
+    self.assertEqual(manifest.size(), 2)
+    manifest.add_ref(manifest.id([4]))
+    self.assertEqual(manifest.size(), 3)
+    self.assertEqual(manifest.refs(3), 1)
+
+
+if __name__ == '__main__':
+  unittest.main()
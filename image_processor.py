@@ -1,10 +1,16 @@
+import array_scanner
+import artifact_table
+import chr_bank
 import chr_tile
 import errors
 import guess_best_palette
 import id_manifest
+import nearest_color
 import palette
+import palette_scorer
 import rgb
 from constants import *
+from profiler import NULL_PROFILER
 
 
 # TODO: Try different image libraries
@@ -12,15 +18,48 @@ from constants import *
 
 class ImageProcessor(object):
 
-  def __init__(self):
+  # use_array_scanner: Whether to scan tiles with the array-backed scanner.
+  #                    Defaults to using it if numpy is available.
+  # palette_search_budget: Maximum number of steps to spend guessing the
+  #                        palette, or None for no limit.
+  # palette_objective: How to choose between valid palettes when guessing,
+  #                    one of palette_scorer.OBJECTIVES.
+  # shared_bank: ChrBank shared with other images. If not set, the image gets
+  #              a single chr bank of its own.
+  # profiler: Profiler to record stages and counters to.
+  # palette_memo: PaletteMemo of guessed palettes to reuse, or None.
+  def __init__(self, use_array_scanner=None, palette_search_budget=None,
+               palette_objective='first', shared_bank=None, profiler=None,
+               palette_memo=None):
+    if use_array_scanner is None:
+      use_array_scanner = array_scanner.is_available()
+    self._use_array_scanner = use_array_scanner
+    self._palette_search_budget = palette_search_budget
+    self._palette_objective = palette_objective
+    self._shared_bank = shared_bank
+    self._profiler = profiler or NULL_PROFILER
+    self._palette_memo = palette_memo
+    self.reset()
+
+  # reset
+  #
+  # Forget the results of processing an image, so that the next one starts
+  # from scratch.
+  def reset(self):
+    self._scanner = None
+    self._xlat_misses = 0
     self._nt_count = {}
-    self._nametable_cache = {}
+    self._chr_bank = self._shared_bank or chr_bank.ChrBank(1)
+    self._bank_num = None
     self._chr_data = []
-    self._color_manifest = id_manifest.IdManifest()
-    self._dot_manifest = id_manifest.IdManifest()
-    self._block_color_manifest = id_manifest.IdManifest()
-    self._artifacts = [row[:] for row in
-                       [[None]*(NUM_BLOCKS_X*2)]*(NUM_BLOCKS_Y*2)]
+    self._screen_tiles = []
+    self._color_manifest = id_manifest.IdManifest(key=tuple)
+    self._dot_manifest = id_manifest.IdManifest(key=tuple)
+    self._block_color_manifest = id_manifest.IdManifest(key=frozenset)
+    self._counting_refs = False
+    self._xlats = {}
+    self._chr_tiles = {}
+    self._artifacts = artifact_table.ArtifactTable()
     self._palette = None
     self._err = errors.ErrorCollector()
 
@@ -46,9 +85,22 @@ class ImageProcessor(object):
   def dot_manifest(self):
     return self._dot_manifest
 
+  # chr_data
+  #
+  # Get the chr that the nametable refers to. With a shared chr bank, this is
+  # the whole bank so far, including the tiles of earlier images.
   def chr_data(self):
     return self._chr_data
 
+  # screen_tiles
+  #
+  # Get the unique chr tiles used by this image alone.
+  def screen_tiles(self):
+    return self._screen_tiles
+
+  def bank_num(self):
+    return self._bank_num
+
   # components_to_nescolor
   #
   # Given the color components of a pixel from PIL/pillow, find the
@@ -60,18 +112,9 @@ class ImageProcessor(object):
   # g: The green value of the pixel.
   # b: The blue value of the pixel.
   def components_to_nescolor(self, r, g, b):
-    found_nc = -1
-    found_diff = float('infinity')
-    colors = rgb.RGB_COLORS
-    for i,allow_val in enumerate(colors):
-      diff_r = abs(r - allow_val / (256 * 256))
-      diff_g = abs(g - (allow_val / 256) % 256)
-      diff_b = abs(b - allow_val % 256)
-      diff = diff_r + diff_g + diff_b
-      if diff < found_diff:
-        found_nc = i
-        found_diff = diff
-    if found_diff > rgb.COLOR_TOLERANCE:
+    self._xlat_misses += 1
+    found_nc = nearest_color.get_table().find(r, g, b)
+    if found_nc == -1:
       return -1
     color_val = r * 256 * 256 + g * 256 + b
     rgb.RGB_XLAT[color_val] = found_nc
@@ -96,7 +139,7 @@ class ImageProcessor(object):
 
   # collect_errors
   #
-  # Add the exception to the error exception and clear the artifacts entry.
+  # Add the exception to the error collector and clear the artifacts entry.
   #
   # e: The exception that got caught.
   # block_y: The y of the block.
@@ -107,12 +150,12 @@ class ImageProcessor(object):
   def collect_error(self, e, block_y, block_x, i, j, is_block=False):
     self._err.add(e)
     if is_block:
-      self._artifacts[block_y * 2 + 0][block_x * 2 + 0] = [0, 0, 0, 0]
-      self._artifacts[block_y * 2 + 0][block_x * 2 + 1] = [0, 0, 0, 0]
-      self._artifacts[block_y * 2 + 1][block_x * 2 + 0] = [0, 0, 0, 0]
-      self._artifacts[block_y * 2 + 1][block_x * 2 + 1] = [0, 0, 0, 0]
+      self._artifacts.clear_tile(block_y * 2 + 0, block_x * 2 + 0)
+      self._artifacts.clear_tile(block_y * 2 + 0, block_x * 2 + 1)
+      self._artifacts.clear_tile(block_y * 2 + 1, block_x * 2 + 0)
+      self._artifacts.clear_tile(block_y * 2 + 1, block_x * 2 + 1)
     else:
-      self._artifacts[block_y * 2 + i][block_x * 2 + j] = [0, 0, 0, 0]
+      self._artifacts.clear_tile(block_y * 2 + i, block_x * 2 + j)
 
   # process_tile
   #
@@ -158,6 +201,18 @@ class ImageProcessor(object):
       raise errors.PaletteOverflowError(tile_y, tile_x)
     return color_needs, dot_profile
 
+  # get_tile
+  #
+  # Get the color needs and dot profile of a tile, either from the array
+  # scanner if it was used on the image, or else by processing the tile.
+  #
+  # tile_y: The y position of the tile, 0..29.
+  # tile_x: The x position of the tile, 0..31.
+  def get_tile(self, tile_y, tile_x):
+    if self._scanner:
+      return self._scanner.get(tile_y, tile_x)
+    return self.process_tile(tile_y, tile_x)
+
   # process_block
   #
   # Process the individual tiles in the block.
@@ -168,22 +223,30 @@ class ImageProcessor(object):
     block_color_needs = set([])
     y = block_y * 2
     x = block_x * 2
+    positions = []
+    color_needs_list = []
+    dot_profiles = []
     for i in xrange(2):
       for j in xrange(2):
         try:
-          (color_needs, dot_profile) = self.process_tile(y + i, x + j)
+          (color_needs, dot_profile) = self.get_tile(y + i, x + j)
         except (errors.PaletteOverflowError, errors.ColorNotAllowedError) as e:
           self.collect_error(e, block_y, block_x, i, j)
           continue
-        cid = self._color_manifest.id(color_needs)
-        did = self._dot_manifest.id(dot_profile)
-        self._artifacts[y + i][x + j] = [cid, did, None, None]
+        positions.append((y + i, x + j))
+        color_needs_list.append(color_needs)
+        dot_profiles.append(dot_profile)
         block_color_needs |= set(color_needs)
+    cids = self._color_manifest.ids(color_needs_list)
+    dids = self._dot_manifest.ids(dot_profiles)
+    for (tile_y, tile_x), cid, did in zip(positions, cids, dids):
+      self._artifacts.set(tile_y, tile_x, ARTIFACT_CID, cid)
+      self._artifacts.set(tile_y, tile_x, ARTIFACT_DID, did)
     block_color_needs = block_color_needs - set([None])
     if len(block_color_needs) > PALETTE_SIZE:
       raise errors.PaletteOverflowError(block_y, block_x, is_block=True)
     bcid = self._block_color_manifest.id(block_color_needs)
-    self._artifacts[y][x][ARTIFACT_BCID] = bcid
+    self._artifacts.set_block(block_y, block_x, ARTIFACT_BCID, bcid)
 
   def get_dot_xlat(self, color_needs, palette_option):
     dot_xlat = []
@@ -198,28 +261,77 @@ class ImageProcessor(object):
         raise IndexError
     return dot_xlat
 
-  def get_nametable_num(self, xlat, did):
-    key = str([did] + xlat)
-    if not key in self._nametable_cache:
-      dot_profile = self._dot_manifest.get(did)
-      tile = chr_tile.ChrTile()
-      for row in xrange(8):
-        for col in xrange(8):
-          i = row * 8 + col
-          val = xlat[dot_profile[i]]
-          tile.set(row, col, val)
-      nt_num = len(self._chr_data)
-      self._chr_data.append(tile)
+  # make_nametable
+  #
+  # Add the chr tiles of the image to the chr bank, then fill in the nametable
+  # from their positions in the bank.
+  #
+  # tile_positions: List of the y and x of each tile that has chr.
+  # tiles: List with the ChrTile for each of those positions.
+  def make_nametable(self, tile_positions, tiles):
+    uniq = {}
+    screen_tiles = []
+    for tile in tiles:
+      if not tile in uniq:
+        uniq[tile] = len(screen_tiles)
+        screen_tiles.append(tile)
+    (self._bank_num, nt_nums) = self._chr_bank.add_screen(screen_tiles)
+    self._profiler.count('tiles with chr', len(tiles))
+    self._profiler.count('tiles deduped', len(tiles) - len(screen_tiles))
+    self._chr_data = self._chr_bank.tiles(self._bank_num)
+    self._screen_tiles = screen_tiles
+    for nt_num in nt_nums:
       self._nt_count[nt_num] = 0
-      self._nametable_cache[key] = nt_num
-    nt_num = self._nametable_cache[key]
-    self._nt_count[nt_num] += 1
-    return nt_num
+    for (y, x), tile in zip(tile_positions, tiles):
+      nt_num = nt_nums[uniq[tile]]
+      self._artifacts.set(y, x, ARTIFACT_NT, nt_num)
+      self._nt_count[nt_num] += 1
 
+  # make_palette_scorer
+  #
+  # Make a scorer that rates palettes by the chr tiles the image would need.
+  def make_palette_scorer(self):
+    scorer = palette_scorer.TileCountScorer(self._color_manifest,
+                                            self._block_color_manifest,
+                                            self._palette_objective)
+    cids = self._artifacts.plane(ARTIFACT_CID)
+    dids = self._artifacts.plane(ARTIFACT_DID)
+    bcids = self._artifacts.plane(ARTIFACT_BCID)
+    for k in xrange(len(cids)):
+      scorer.add_tile(cids[k], dids[k], bcids[k])
+    return scorer
+
+  # process_image
+  #
+  # Process the image, creating the palette, artifacts and chr. Each stage
+  # is a separate method, so that they can also be run and timed one at a
+  # time.
+  #
+  # img: The pixel art image.
+  # palette_text: Palette to use, or None to guess one.
   def process_image(self, img, palette_text, want_errors):
-    self.load_image(img)
-    # For each block, look at each tile and get their color needs and
-    # dot profile. Save the corresponding ids in the artifact table.
+    prof = self._profiler
+    with prof.stage('load'):
+      self.load_image(img)
+    with prof.stage('scan'):
+      self.scan_image(img)
+    with prof.stage('palette'):
+      if not self.process_palette(palette_text):
+        return
+    with prof.stage('attributes'):
+      self.assign_attributes()
+    with prof.stage('chr'):
+      self.make_chr()
+
+  # scan_image
+  #
+  # For each block, look at each tile and get their color needs and dot
+  # profile. Save the corresponding ids in the artifact table. The image
+  # should have already been loaded using self.load_image.
+  def scan_image(self, img):
+    if self._use_array_scanner:
+      self._scanner = array_scanner.ArrayScanner()
+      self._scanner.scan(img, self.components_to_nescolor)
     for block_y in xrange(NUM_BLOCKS_Y):
       for block_x in xrange(NUM_BLOCKS_X):
         try:
@@ -227,6 +339,35 @@ class ImageProcessor(object):
         except errors.PaletteOverflowError as e:
           self.collect_error(e, block_y, block_x, 0, 0, is_block=True)
           continue
+    self.count_scan()
+
+  # count_scan
+  #
+  # Record counters about scanning the image to the profiler.
+  def count_scan(self):
+    prof = self._profiler
+    if prof is NULL_PROFILER:
+      return
+    num_pixels = (min(self.image_y / TILE_SIZE, NUM_BLOCKS_Y * 2) *
+                  min(self.image_x / TILE_SIZE, NUM_BLOCKS_X * 2) *
+                  TILE_SIZE * TILE_SIZE)
+    prof.count('pixels scanned', num_pixels)
+    # The array scanner looks up each distinct color once, instead of each
+    # pixel.
+    num_lookups = self._scanner.num_colors if self._scanner else num_pixels
+    prof.count('RGB_XLAT hits', num_lookups - self._xlat_misses)
+    prof.count('RGB_XLAT misses', self._xlat_misses)
+    prof.count('color needs', self._color_manifest.size())
+    prof.count('dot profiles', self._dot_manifest.size())
+    prof.count('block color needs', self._block_color_manifest.size())
+
+  # process_palette
+  #
+  # Parse the palette if one was passed, otherwise guess it from the color
+  # needs. Returns whether there is a palette.
+  #
+  # palette_text: Palette to use, or None to guess one.
+  def process_palette(self, palette_text):
     # If palette argument was passed, use that palette.
     if palette_text:
       try:
@@ -234,41 +375,265 @@ class ImageProcessor(object):
         self._palette = parser.parse(palette_text)
       except errors.PaletteParseError as e:
         self._err.add(e)
-        return
-    else:
-      # Make the palette from the color needs.
-      guesser = guess_best_palette.GuessBestPalette()
+        return False
+    elif not self.recall_palette():
+      # Make the palette from the color needs, unless it was guessed before.
+      guesser = guess_best_palette.GuessBestPalette(
+          self._palette_search_budget)
+      scorer = None
+      if self._palette_objective != 'first' and not self._err.has():
+        scorer = self.make_palette_scorer()
       try:
-        self._palette = guesser.make_palette(self._block_color_manifest.elems())
+        self._palette = guesser.make_palette(self.block_color_needs(), scorer)
       except errors.TooManyPalettesError as e:
         self._err.add(e)
-        return
-    # For each block, get the attribute aka the palette.
-    for block_y in xrange(NUM_BLOCKS_Y):
-      for block_x in xrange(NUM_BLOCKS_X):
-        y = block_y * 2
-        x = block_x * 2
-        (cid, did, bcid, unused) = self._artifacts[y][x]
+        return False
+      finally:
+        self._profiler.count('palette search steps', guesser.nodes_explored())
+      self.remember_palette()
+    return True
+
+  def palette_memo_key(self):
+    if self._palette_memo is None or self._palette_objective != 'first':
+      return None
+    return self._palette_memo.key(self.block_color_needs(),
+                                  self._palette_search_budget)
+
+  # recall_palette
+  #
+  # Use the palette from the memo, if one was guessed earlier for the same
+  # color needs. Returns whether it was found. An entry that can't be parsed
+  # is treated as missing, and is replaced once the palette is guessed.
+  def recall_palette(self):
+    key = self.palette_memo_key()
+    if key is None:
+      return False
+    text = self._palette_memo.get(key)
+    if text is None:
+      return False
+    try:
+      self._palette = palette.PaletteParser().parse(text)
+    except errors.PaletteParseError:
+      return False
+    self._profiler.count('palette memo hits')
+    return True
+
+  def remember_palette(self):
+    key = self.palette_memo_key()
+    if key is not None:
+      self._palette_memo.put(key, str(self._palette))
+
+  # assign_attributes
+  #
+  # For each block, get the attribute aka the palette.
+  #
+  # blocks: List of the y and x of the blocks to assign, or None for all.
+  def assign_attributes(self, blocks=None):
+    if blocks is None:
+      blocks = [(block_y, block_x) for block_y in xrange(NUM_BLOCKS_Y)
+                for block_x in xrange(NUM_BLOCKS_X)]
+    # Blocks only have a few distinct color needs, so select the palette
+    # once for each of them.
+    pids = {}
+    for (block_y, block_x) in blocks:
+      bcid = self._artifacts.get(block_y * 2, block_x * 2, ARTIFACT_BCID)
+      pid = pids.get(bcid)
+      if pid is None:
         block_color_needs = self._block_color_manifest.get(bcid)
-        (pid, palette_option) = self._palette.select(block_color_needs)
-        # TODO: Maybe better to get palette per block instead of assigning it
-        # to each tile?
-        self._artifacts[y][x][ARTIFACT_PID] = pid
-        self._artifacts[y][x+1][ARTIFACT_PID] = pid
-        self._artifacts[y+1][x][ARTIFACT_PID] = pid
-        self._artifacts[y+1][x+1][ARTIFACT_PID] = pid
-    # For each tile in the artifact table, create the chr and nametable.
+        pid = pids[bcid] = self._palette.select(block_color_needs)[0]
+      self._artifacts.set_block(block_y, block_x, ARTIFACT_PID, pid)
+
+  # make_chr
+  #
+  # Create the chr and nametable for the tiles of the image.
+  def make_chr(self):
+    # For each tile in the artifact table, create the chr and nametable. The
+    # dot xlat only depends on the color needs and palette, and the chr tile
+    # on those plus the dot profile, so each is made once and then reused,
+    # even by later updates to the image, as long as the palette is the same.
+    xlats = self._xlats
+    chr_tiles = self._chr_tiles
+    tile_positions = []
+    tiles = []
     for y in xrange(NUM_BLOCKS_Y * 2):
       for x in xrange(NUM_BLOCKS_X * 2):
-        (cid, did, pid, unused) = self._artifacts[y][x]
-        palette_option = self._palette.get(pid)
-        color_needs = self._color_manifest.get(cid)
-        dot_xlat = self.get_dot_xlat(color_needs, palette_option)
-        # If there was an error in the tile, the dot_xlat will be empty. So
-        # skip this entry.
-        if dot_xlat:
-          nt_num = self.get_nametable_num(dot_xlat, did)
-          self._artifacts[y][x][ARTIFACT_NT] = nt_num
-    # Fail if there were any errors.
+        # Tiles with errors have no chr.
+        if self._artifacts.get(y, x, ARTIFACT_ERR):
+          continue
+        cid = self._artifacts.get(y, x, ARTIFACT_CID)
+        did = self._artifacts.get(y, x, ARTIFACT_DID)
+        pid = self._artifacts.get(y, x, ARTIFACT_PID)
+        key = (cid, did, pid)
+        if not key in chr_tiles:
+          dot_xlat = xlats.get((cid, pid))
+          if dot_xlat is None:
+            palette_option = self._palette.get(pid)
+            color_needs = self._color_manifest.get(cid)
+            dot_xlat = self.get_dot_xlat(color_needs, palette_option)
+            xlats[(cid, pid)] = dot_xlat
+          # If the tile is empty, the dot_xlat will be empty too, and there
+          # is no chr for it.
+          tile = None
+          if dot_xlat:
+            dot_profile = self._dot_manifest.get(did)
+            tile = chr_tile.from_dot_profile(dot_profile, dot_xlat)
+          chr_tiles[key] = tile
+        tile = chr_tiles[key]
+        if tile is not None:
+          tile_positions.append((y, x))
+          tiles.append(tile)
+    # Fail if there were any errors, before adding anything to the chr bank.
     if self._err.has():
       return
+    try:
+      self.make_nametable(tile_positions, tiles)
+    except errors.ChrBankOverflowError as e:
+      self._err.add(e)
+
+  # update_image
+  #
+  # Update the results of process_image after part of the image was edited.
+  # Only the blocks that overlap the changed rectangle are scanned again, and
+  # the manifests count references so that color needs and dot profiles that
+  # are no longer used drop out. The palette is only guessed again if the set
+  # of block color needs changed, otherwise the rest of the artifact table is
+  # reused. The chr is always made again, so that it matches what processing
+  # the whole image would give. If the earlier results had errors, or the
+  # image changed size, the image is processed from scratch instead. With a
+  # shared chr bank, tiles that are no longer used stay in the bank.
+  #
+  # img: The edited pixel art image.
+  # rect: The changed pixels, as a (left, top, right, bottom) box, where
+  #       right and bottom are exclusive, the same as PIL.
+  # palette_text: Palette to use, or None to guess one.
+  def update_image(self, img, rect, palette_text):
+    if (self._palette is None or self._err.has() or
+        img.size != (self.image_x, self.image_y)):
+      self.reset()
+      self.process_image(img, palette_text, None)
+      return
+    prof = self._profiler
+    with prof.stage('load'):
+      self.load_image(img)
+    with prof.stage('scan'):
+      old_color_sets = self.block_color_sets()
+      blocks = self.blocks_in_rect(rect)
+      self.rescan_blocks(blocks)
+    if self._err.has():
+      return
+    with prof.stage('palette'):
+      old_palette = str(self._palette)
+      if palette_text or self.block_color_sets() != old_color_sets:
+        if not self.process_palette(palette_text):
+          return
+    with prof.stage('attributes'):
+      if str(self._palette) == old_palette:
+        self.assign_attributes(blocks)
+      else:
+        self._xlats = {}
+        self._chr_tiles = {}
+        self.assign_attributes()
+    with prof.stage('chr'):
+      if self._shared_bank is None:
+        self._chr_bank = chr_bank.ChrBank(1)
+      self._nt_count = {}
+      self._artifacts.clear_plane(ARTIFACT_NT)
+      self.make_chr()
+
+  # blocks_in_rect
+  #
+  # Get the y and x of each block that overlaps the rectangle.
+  #
+  # rect: A (left, top, right, bottom) box of pixels.
+  def blocks_in_rect(self, rect):
+    (left, top, right, bottom) = rect
+    if right <= left or bottom <= top:
+      return []
+    return [(block_y, block_x)
+            for block_y in xrange(max(top, 0) / BLOCK_SIZE,
+                                  min((bottom - 1) / BLOCK_SIZE + 1,
+                                      NUM_BLOCKS_Y))
+            for block_x in xrange(max(left, 0) / BLOCK_SIZE,
+                                  min((right - 1) / BLOCK_SIZE + 1,
+                                      NUM_BLOCKS_X))]
+
+  # block_color_needs
+  #
+  # Get the distinct color needs of blocks, in the order they were first
+  # found. Once references are counted, this leaves out those that are no
+  # longer used.
+  def block_color_needs(self):
+    if not self._counting_refs:
+      return self._block_color_manifest.elems()
+    seen = set()
+    result = []
+    for block_y in xrange(NUM_BLOCKS_Y):
+      for block_x in xrange(NUM_BLOCKS_X):
+        bcid = self._artifacts.get(block_y * 2, block_x * 2, ARTIFACT_BCID)
+        if not bcid in seen:
+          seen.add(bcid)
+          result.append(self._block_color_manifest.get(bcid))
+    return result
+
+  def block_color_sets(self):
+    return set([frozenset(needs) for needs in self.block_color_needs()])
+
+  # count_refs
+  #
+  # Start counting references to every id in the manifests, from the
+  # artifact table.
+  def count_refs(self):
+    self._color_manifest.count_refs(self._artifacts.plane(ARTIFACT_CID))
+    self._dot_manifest.count_refs(self._artifacts.plane(ARTIFACT_DID))
+    self._block_color_manifest.count_refs(
+      [self._artifacts.get(block_y * 2, block_x * 2, ARTIFACT_BCID)
+       for block_y in xrange(NUM_BLOCKS_Y) for block_x in xrange(NUM_BLOCKS_X)])
+    self._counting_refs = True
+
+  # update_refs
+  #
+  # Add or release the references from a block to the manifests.
+  #
+  # block_y: The y position of the block.
+  # block_x: The x position of the block.
+  # add: Whether to add references, otherwise they are released.
+  def update_refs(self, block_y, block_x, add):
+    art = self._artifacts
+    y = block_y * 2
+    x = block_x * 2
+    manifests = [(self._color_manifest, ARTIFACT_CID),
+                 (self._dot_manifest, ARTIFACT_DID)]
+    for i in xrange(2):
+      for j in xrange(2):
+        for (manifest, kind) in manifests:
+          n = art.get(y + i, x + j, kind)
+          if add:
+            manifest.add_ref(n)
+          else:
+            manifest.release(n)
+    bcid = art.get(y, x, ARTIFACT_BCID)
+    if add:
+      self._block_color_manifest.add_ref(bcid)
+    else:
+      self._block_color_manifest.release(bcid)
+
+  # rescan_blocks
+  #
+  # Scan the blocks again, reading each pixel from the image, and update the
+  # references to the manifests.
+  #
+  # blocks: List of the y and x of the blocks to scan.
+  def rescan_blocks(self, blocks):
+    if not self._counting_refs:
+      self.count_refs()
+    # The array scanner has results for the earlier image.
+    self._scanner = None
+    for (block_y, block_x) in blocks:
+      self.update_refs(block_y, block_x, False)
+      try:
+        self.process_block(block_y, block_x)
+      except errors.PaletteOverflowError as e:
+        self.collect_error(e, block_y, block_x, 0, 0, is_block=True)
+        continue
+      self.update_refs(block_y, block_x, True)
+    self._profiler.count('blocks rescanned', len(blocks))
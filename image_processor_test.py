@@ -0,0 +1,98 @@
+import unittest
+
+import benchmark
+import binary_output
+import errors
+import image_processor
+import profiler
+import random
+
+
+class ImageProcessorTests(unittest.TestCase):
+  def get_outputs(self, processor):
+    self.assertFalse(processor.err().has())
+    output = binary_output.BinaryOutput()
+    output.save_nametable(processor.artifacts())
+    output.save_chr(processor.chr_data())
+    output.save_palette(processor.palette())
+    output.save_attribute(processor.artifacts())
+    return ([output.get_product(kind)
+             for kind in ['nametable', 'chr', 'palette', 'attribute']] +
+            [processor.dot_manifest().size(),
+             processor.color_manifest().size()])
+
+  def process(self, img):
+    processor = image_processor.ImageProcessor()
+    processor.process_image(img, None, None)
+    return processor
+
+  def paint(self, img, rect, nc):
+    color = benchmark.to_rgb(nc)
+    pixels = img.load()
+    for y in xrange(rect[1], rect[3]):
+      for x in xrange(rect[0], rect[2]):
+        pixels[x, y] = color
+
+  def test_too_many_tiles(self):
+    img = benchmark.make_unique_tiles(random.Random(0))
+    # The tile after the first 256 repeats the first one, until its first
+    # row is changed.
+    self.paint(img, (0, 64, 8, 65), 0x30)
+    processor = self.process(img)
+    self.assertEqual([type(e) for e in processor.err().get()],
+                     [errors.ChrBankOverflowError])
+    self.assertEqual(str(processor.err().get()[0]),
+                     'Needs 257 tiles, which do not fit in any of 1 chr bank')
+
+  def test_update_matches_full_processing(self):
+    img = benchmark.make_mergeable(random.Random(0))
+    processor = self.process(img)
+    # The last two edits change which color sets are used, so the palette
+    # needs to be guessed again.
+    edits = [((20, 20, 24, 26), 0x0f),
+             ((100, 50, 101, 51), 0x0f),
+             ((0, 0, 128, 240), 0x0f),
+             ((32, 32, 48, 48), 0x21)]
+    for (rect, nc) in edits:
+      self.paint(img, rect, nc)
+      processor.update_image(img, rect, None)
+      self.assertEqual(self.get_outputs(processor),
+                       self.get_outputs(self.process(img)))
+
+  def test_update_changes_palette(self):
+    img = benchmark.make_blank(random.Random(0))
+    processor = self.process(img)
+    for (rect, nc) in [((16, 16, 24, 24), 0x16), ((40, 0, 48, 4), 0x2a),
+                       ((16, 16, 32, 32), 0x0f)]:
+      self.paint(img, rect, nc)
+      processor.update_image(img, rect, None)
+      self.assertEqual(self.get_outputs(processor),
+                       self.get_outputs(self.process(img)))
+    self.assertEqual(str(processor.palette()), 'P/0f-2a/')
+
+  def test_update_only_rescans_changed_blocks(self):
+    img = benchmark.make_max_palettes(random.Random(0))
+    processor = self.process(img)
+    prof = profiler.Profiler()
+    processor._profiler = prof
+    rect = (30, 10, 34, 12)
+    self.paint(img, rect, 0x0f)
+    processor.update_image(img, rect, None)
+    counters = dict(prof.counters())
+    self.assertEqual(counters['blocks rescanned'], 2)
+    self.assertNotIn('palette search steps', counters)
+
+  def test_update_after_errors(self):
+    img = benchmark.make_max_palettes(random.Random(0))
+    processor = self.process(img)
+    self.paint(img, (0, 0, 1, 1), 0x2a)
+    processor.update_image(img, (0, 0, 1, 1), None)
+    self.assertTrue(processor.err().has())
+    self.paint(img, (0, 0, 1, 1), 0x0f)
+    processor.update_image(img, (0, 0, 1, 1), None)
+    self.assertEqual(self.get_outputs(processor),
+                     self.get_outputs(self.process(img)))
+
+
+if __name__ == '__main__':
+  unittest.main()
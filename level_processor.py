@@ -0,0 +1,120 @@
+import app
+import binary_output
+import chr_bank
+from errors import CommandLineArgError
+import image_processor
+import palette_memo
+import sys
+from constants import *
+
+
+# Options that only make sense for a single screen.
+SCREEN_ONLY_OPTIONS = [('compile', '-c'), ('error_outfile', '-e'),
+                       ('flip_chr', '--flip-chr'),
+                       ('shared_chr', '--shared-chr')] + [
+                      (option, '--' + option.replace('_', '-'))
+                      for option in app.VIEW_OPTIONS]
+
+
+# iter_screens
+#
+# Split a level into screens, yielding the row and column of each screen
+# along with its image. Screens are cropped one at a time, but PIL decodes
+# the entire level image when it is first cropped, so memory still grows with
+# the size of the level. Screens at the right and bottom edges are cut short
+# where the level ends.
+#
+# img: The image of the entire level.
+def iter_screens(img):
+  (width, height) = img.size
+  for row, top in enumerate(xrange(0, height, HEIGHT)):
+    bottom = min(top + HEIGHT, height)
+    for col, left in enumerate(xrange(0, width, WIDTH)):
+      right = min(left + WIDTH, width)
+      yield row, col, img.crop((left, top, right, bottom))
+
+
+# LevelProcessor
+#
+# Converts a level that is larger than a single screen. Each screen is
+# processed in turn, against a chr bank that is shared by the entire level,
+# and its outputs are saved before moving on to the next. The results of only
+# a single screen are kept at a time, but the whole level image is decoded,
+# so peak memory is not bounded by the size of a screen.
+class LevelProcessor(object):
+  def __init__(self):
+    self.num_screens = 0
+    self.failed = []
+
+  def check_args(self, args):
+    for (option, flag) in SCREEN_ONLY_OPTIONS:
+      if getattr(args, option):
+        raise CommandLineArgError('%s can not be used with --level' % flag)
+
+  # screen_template
+  #
+  # Get the template for the outputs of a single screen. The kind of output
+  # is followed by the row and column of the screen, such as
+  # "nametable-0-3.dat".
+  def screen_template(self, tmpl, row, col):
+    return tmpl.replace('%s', '%%s-%d-%d' % (row, col))
+
+  # process_level
+  #
+  # Process every screen of the level, yielding the row, column and
+  # ImageProcessor for each one.
+  #
+  # img: The image of the entire level.
+  # args: Command-line arguments.
+  # bank: ChrBank shared by the screens.
+  def process_level(self, img, args, bank):
+    memo = None if args.no_palette_memo else palette_memo.get_memo()
+    for (row, col, screen) in iter_screens(img):
+      processor = image_processor.ImageProcessor(
+          palette_search_budget=args.palette_search_budget,
+          palette_objective=args.palette_objective,
+          shared_bank=bank, palette_memo=memo)
+      processor.process_image(screen, args.palette, None)
+      yield row, col, processor
+
+  # run
+  #
+  # Convert the level, saving the nametable, attribute, palette and chr bank
+  # number of each screen, and then the chr for all of them. Returns whether
+  # every screen was converted.
+  #
+  # img: The image of the entire level.
+  # args: Command-line arguments.
+  def run(self, img, args):
+    self.check_args(args)
+    tmpl = app.Application().output_template(args)
+    bank = chr_bank.ChrBank(args.chr_banks)
+    self.num_screens = 0
+    self.failed = []
+    for (row, col, processor) in self.process_level(img, args, bank):
+      self.num_screens += 1
+      if processor.err().has():
+        self.failed.append((row, col))
+        es = processor.err().get()
+        print('Screen ({0}, {1}) has {2} error{3}:'.format(
+            row, col, len(es), 's'[len(es) == 1:]))
+        for e in es:
+          print('{0} {1}'.format(type(e).__name__, e))
+        continue
+      output = binary_output.BinaryOutput(self.screen_template(tmpl, row, col))
+      output.save_nametable(processor.artifacts())
+      output.save_palette(processor.palette())
+      output.save_attribute(processor.artifacts())
+      output.save_bank(processor.bank_num())
+      if args.chr_banks > 1:
+        print('Screen ({0}, {1}) uses chr bank {2}'.format(
+            row, col, processor.bank_num()))
+    fout = open(tmpl.replace('%s', 'chr'), 'wb')
+    fout.write(bank.get_bytes())
+    fout.close()
+    num_banks = bank.num_banks()
+    sys.stdout.write('Number of screens: {0}\n'
+                     'Number of tiles: {1} in {2} bank{3}\n'.format(
+                       self.num_screens, bank.num_tiles(), num_banks,
+                       's'[num_banks == 1:]))
+    return not self.failed
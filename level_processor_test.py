@@ -0,0 +1,93 @@
+import unittest
+
+import benchmark
+from errors import CommandLineArgError
+import level_processor
+import makechr
+import os
+import random
+from PIL import Image
+import shutil
+import StringIO
+import sys
+import tempfile
+
+
+class LevelProcessorTests(unittest.TestCase):
+  def setUp(self):
+    self.tmpdir = tempfile.mkdtemp()
+
+  def tearDown(self):
+    shutil.rmtree(self.tmpdir)
+
+  def make_args(self, **kwargs):
+    args = makechr.make_parser().parse_args(['-X', '--level'])
+    args.output = os.path.join(self.tmpdir, '%s.dat')
+    for k, v in kwargs.items():
+      setattr(args, k, v)
+    return args
+
+  def test_iter_screens(self):
+    img = Image.new('RGB', (600, 300))
+    screens = [(row, col, screen.size)
+               for (row, col, screen) in level_processor.iter_screens(img)]
+    self.assertEqual(screens, [(0, 0, (256, 240)), (0, 1, (256, 240)),
+                               (0, 2, (88, 240)), (1, 0, (256, 60)),
+                               (1, 1, (256, 60)), (1, 2, (88, 60))])
+
+  def test_run(self):
+    img = Image.new('RGB', (512, 240), (0, 0x78, 0xf8))
+    img.paste((0, 0, 0), (256, 0, 512, 120))
+    processor = level_processor.LevelProcessor()
+    real_stdout = sys.stdout
+    sys.stdout = StringIO.StringIO()
+    try:
+      ok = processor.run(img, self.make_args())
+    finally:
+      log = sys.stdout.getvalue()
+      sys.stdout = real_stdout
+    self.assertTrue(ok)
+    self.assertEqual(processor.num_screens, 2)
+    self.assertTrue('Number of tiles: 2 in 1 bank' in log)
+    for kind in ['nametable-0-0', 'nametable-0-1', 'attribute-0-1',
+                 'palette-0-1', 'chr']:
+      self.assertTrue(os.path.isfile(os.path.join(self.tmpdir,
+                                                  kind + '.dat')))
+    fin = open(os.path.join(self.tmpdir, 'nametable-0-1.dat'), 'rb')
+    nametable = fin.read()
+    fin.close()
+    self.assertEqual(nametable, '\x00' * 480 + '\x01' * 480)
+
+  def test_run_two_banks(self):
+    # The first screen fills a bank, so the second needs one of its own.
+    img = Image.new('RGB', (512, 240), (0, 0x78, 0xf8))
+    img.paste(benchmark.make_unique_tiles(random.Random(0)), (0, 0))
+    processor = level_processor.LevelProcessor()
+    real_stdout = sys.stdout
+    sys.stdout = StringIO.StringIO()
+    try:
+      ok = processor.run(img, self.make_args(chr_banks=2))
+    finally:
+      log = sys.stdout.getvalue()
+      sys.stdout = real_stdout
+    self.assertTrue(ok)
+    self.assertTrue('Screen (0, 1) uses chr bank 1' in log)
+    self.assertTrue('Number of tiles: 257 in 2 banks' in log)
+    banks = []
+    for name in ['bank-0-0', 'bank-0-1']:
+      fin = open(os.path.join(self.tmpdir, name + '.dat'), 'rb')
+      banks.append(fin.read())
+      fin.close()
+    self.assertEqual(banks, ['\x00', '\x01'])
+    self.assertEqual(os.path.getsize(os.path.join(self.tmpdir, 'chr.dat')),
+                     2 * 8192)
+
+  def test_screen_only_options(self):
+    processor = level_processor.LevelProcessor()
+    with self.assertRaises(CommandLineArgError):
+      processor.run(Image.new('RGB', (256, 240)),
+                    self.make_args(compile='level.nes'))
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -1,13 +1,21 @@
 import app
 import argparse
+import batch
+from errors import CommandLineArgError
+import glob
+import level_processor
+import palette_scorer
+import profiler
 from PIL import Image
 import sys
+import watcher
 
 
-def run():
+def make_parser():
   parser = argparse.ArgumentParser(description='Make chr data files and ' +
                                    'other NES graphics files')
-  parser.add_argument('input', type=str, help='filename for pixel art image')
+  parser.add_argument('input', type=str, nargs='*',
+                      help='filenames or glob patterns for pixel art images')
   parser.add_argument('-X', dest='experimental', action='store_true',
                       required=True,
                       help='enable experimental features (required)')
@@ -19,6 +27,35 @@ def run():
                       help='palette for the pixel art image')
   parser.add_argument('-o', dest='output', metavar='output',
                       help='template for naming output files')
+  parser.add_argument('--palette-search-budget', dest='palette_search_budget',
+                      metavar='steps', type=int,
+                      help='give up guessing the palette after this many '
+                           'steps')
+  parser.add_argument('--palette-objective', dest='palette_objective',
+                      choices=palette_scorer.OBJECTIVES, default='first',
+                      help='how to choose between valid guessed palettes')
+  parser.add_argument('--no-palette-memo', dest='no_palette_memo',
+                      action='store_true',
+                      help='always search for the palette, without using or '
+                      'saving remembered palettes')
+  parser.add_argument('--flip-chr', dest='flip_chr', metavar='chr filename',
+                      help='filename for chr with flipped tiles merged')
+  parser.add_argument('--shared-chr', dest='shared_chr',
+                      metavar='chr filename',
+                      help='filename for chr shared by all images, each '
+                      'image\'s own chr output holds the bank so far')
+  parser.add_argument('--chr-banks', dest='chr_banks', metavar='N', type=int,
+                      default=1,
+                      help='number of 256 tile banks for shared chr')
+  parser.add_argument('--level', dest='level', action='store_true',
+                      help='convert a level made of many screens')
+  parser.add_argument('--tile-report', dest='tile_report', action='store_true',
+                      help='show how many tiles other deduplication would need')
+  parser.add_argument('--profile', dest='profile', nargs='?', const='table',
+                      choices=profiler.FORMATS,
+                      help='show time spent in each stage, as a table or json')
+  parser.add_argument('--watch', dest='watch', action='store_true',
+                      help='convert images again whenever they change')
   parser.add_argument('--palette-view', dest='palette_view',
                       metavar='image filename',
                       help='filename for palette view')
@@ -37,7 +74,33 @@ def run():
   parser.add_argument('--grid-view', dest='grid_view',
                       metavar='image fileanme',
                       help='filename for grid view')
+  parser.add_argument('--manifest', dest='manifest', metavar='manifest',
+                      help='json or csv file listing images to convert')
+  parser.add_argument('-j', '--jobs', dest='jobs', metavar='N', type=int,
+                      default=1,
+                      help='number of images to convert in parallel')
+  parser.add_argument('--cache-dir', dest='cache_dir', metavar='directory',
+                      help='directory for caching outputs between builds')
+  parser.add_argument('--cache-size', dest='cache_size', metavar='megabytes',
+                      type=int, default=100,
+                      help='maximum size of the output cache')
+  return parser
+
+
+def run():
+  parser = make_parser()
   args = parser.parse_args()
+  if args.watch:
+    run_watch(parser, args)
+    return
+  if args.level:
+    run_level(parser, args)
+    return
+  if (len(args.input) != 1 or args.manifest or args.shared_chr or
+      glob.has_magic(args.input[0])):
+    run_batch(parser, args)
+    return
+  args.input = args.input[0]
   try:
     img = Image.open(args.input)
   except IOError:
@@ -47,5 +110,48 @@ def run():
   application.run(img, args)
 
 
+def run_level(parser, args):
+  if len(args.input) != 1 or args.manifest:
+    parser.error('--level needs a single input image')
+  try:
+    img = Image.open(args.input[0])
+  except IOError:
+    sys.stderr.write('Input file not found: "%s"\n' % args.input[0])
+    sys.exit(1)
+  try:
+    ok = level_processor.LevelProcessor().run(img, args)
+  except CommandLineArgError as e:
+    sys.stderr.write('%s\n' % e)
+    sys.exit(1)
+  if not ok:
+    sys.exit(1)
+
+
+def run_watch(parser, args):
+  if not args.input:
+    parser.error('--watch needs images or directories to watch')
+  try:
+    watcher.Watcher(args.input).run(args)
+  except CommandLineArgError as e:
+    sys.stderr.write('%s\n' % e)
+    sys.exit(1)
+
+
+def run_batch(parser, args):
+  try:
+    jobs = batch.expand_inputs(args.input)
+    if args.manifest:
+      jobs += batch.load_manifest(args.manifest)
+    if not jobs:
+      parser.error('no input images')
+    runner = batch.BatchRunner()
+    failed = runner.run(jobs, args, args.jobs)
+  except (CommandLineArgError, IOError) as e:
+    sys.stderr.write('%s\n' % e)
+    sys.exit(1)
+  if failed:
+    sys.exit(1)
+
+
 if __name__ == '__main__':
   run()
@@ -0,0 +1,165 @@
+import hashlib
+import marshal
+import os
+import rgb
+import tempfile
+
+
+CACHE_FORMAT_VERSION = 1
+CUBE_BITS = 5
+CELL_SHIFT = 8 - CUBE_BITS
+CELL_SIZE = 1 << CELL_SHIFT
+CELLS_PER_AXIS = 1 << CUBE_BITS
+
+
+# cache_dir
+#
+# Directory for makechr's persistent caches. Can be changed by setting the
+# environment variable MAKECHR_CACHE_DIR.
+def cache_dir():
+  return (os.environ.get('MAKECHR_CACHE_DIR') or
+          os.path.join(os.path.expanduser('~'), '.cache', 'makechr'))
+
+
+# NearestColorTable
+#
+# Finds the nescolor closest to an rgb value, the same as a linear scan over
+# rgb.RGB_COLORS, but in constant time. The rgb space is quantized into a
+# cube of cells, and each cell keeps only the few nescolors that could be the
+# closest match for some value inside of it, and that are within tolerance.
+# Most cells have a single candidate, or none at all.
+class NearestColorTable(object):
+  def __init__(self, colors, tolerance):
+    self._colors = colors
+    self._tolerance = tolerance
+    self._cells = None
+
+  def cache_key(self):
+    text = '%d:%d:%d:%s' % (CACHE_FORMAT_VERSION, CUBE_BITS, self._tolerance,
+                            ','.join(['%06x' % c for c in self._colors]))
+    return hashlib.sha1(text).hexdigest()
+
+  def cache_filename(self):
+    return os.path.join(cache_dir(), 'nearest-color-%s.dat' % self.cache_key())
+
+  # load
+  #
+  # Load the table from the cache file, or build it and save it to the cache
+  # if it isn't there yet.
+  def load(self):
+    if self.load_cache():
+      return
+    self.build()
+    self.save_cache()
+
+  def load_cache(self):
+    try:
+      fin = open(self.cache_filename(), 'rb')
+      try:
+        (key, cells) = marshal.load(fin)
+      finally:
+        fin.close()
+    except (IOError, EOFError, ValueError, TypeError):
+      return False
+    if key != self.cache_key() or len(cells) != CELLS_PER_AXIS ** 3:
+      return False
+    self._cells = cells
+    return True
+
+  def save_cache(self):
+    # Write to a temporary file then rename it, so that other processes never
+    # see a partially written table. Failure to cache is not an error.
+    try:
+      if not os.path.isdir(cache_dir()):
+        os.makedirs(cache_dir())
+      (fd, tmpname) = tempfile.mkstemp(dir=cache_dir())
+      fout = os.fdopen(fd, 'wb')
+      marshal.dump((self.cache_key(), self._cells), fout)
+      fout.close()
+      os.rename(tmpname, self.cache_filename())
+    except (IOError, OSError):
+      pass
+
+  # axis_bounds
+  #
+  # For each cell along one axis, get the smallest and largest distance from
+  # any value in that cell to each color component.
+  #
+  # components: List of color components, one per candidate color.
+  def axis_bounds(self, components):
+    near = []
+    far = []
+    for cell in xrange(CELLS_PER_AXIS):
+      low = cell * CELL_SIZE
+      high = low + CELL_SIZE - 1
+      near.append([max(low - v, 0, v - high) for v in components])
+      far.append([max(abs(v - low), abs(v - high)) for v in components])
+    return near, far
+
+  # build
+  #
+  # Build the candidate list for every cell. A color is a candidate if it is
+  # within tolerance of some value in the cell, and could be no further away
+  # than the color that is guaranteed to be closest to the entire cell.
+  def build(self):
+    # Duplicate colors never win the linear scan, so only keep the first.
+    indexes = []
+    seen = set()
+    for i, val in enumerate(self._colors):
+      if not val in seen:
+        seen.add(val)
+        indexes.append(i)
+    values = [self._colors[i] for i in indexes]
+    (r_near, r_far) = self.axis_bounds([v / (256 * 256) for v in values])
+    (g_near, g_far) = self.axis_bounds([(v / 256) % 256 for v in values])
+    (b_near, b_far) = self.axis_bounds([v % 256 for v in values])
+    tolerance = self._tolerance
+    cells = []
+    for cr in xrange(CELLS_PER_AXIS):
+      for cg in xrange(CELLS_PER_AXIS):
+        rg_near = [a + b for a, b in zip(r_near[cr], g_near[cg])]
+        rg_far = [a + b for a, b in zip(r_far[cr], g_far[cg])]
+        for cb in xrange(CELLS_PER_AXIS):
+          near = [a + b for a, b in zip(rg_near, b_near[cb])]
+          limit = min(tolerance,
+                      min([a + b for a, b in zip(rg_far, b_far[cb])]))
+          cells.append(tuple([indexes[k] for k, d in enumerate(near)
+                              if d <= limit]))
+    self._cells = cells
+
+  # find
+  #
+  # Find the nescolor for the rgb value, or -1 if no nescolor is within
+  # tolerance.
+  #
+  # r: The red value of the pixel.
+  # g: The green value of the pixel.
+  # b: The blue value of the pixel.
+  def find(self, r, g, b):
+    cell = (((r >> CELL_SHIFT) << (CUBE_BITS * 2)) +
+            ((g >> CELL_SHIFT) << CUBE_BITS) + (b >> CELL_SHIFT))
+    found_nc = -1
+    found_diff = self._tolerance + 1
+    for i in self._cells[cell]:
+      allow_val = self._colors[i]
+      diff = (abs(r - allow_val / (256 * 256)) +
+              abs(g - (allow_val / 256) % 256) +
+              abs(b - allow_val % 256))
+      if diff < found_diff:
+        found_nc = i
+        found_diff = diff
+    return found_nc
+
+
+_table = None
+
+
+# get_table
+#
+# Get the NearestColorTable for the system palette, loading it on first use.
+def get_table():
+  global _table
+  if _table is None:
+    _table = NearestColorTable(rgb.RGB_COLORS, rgb.COLOR_TOLERANCE)
+    _table.load()
+  return _table
@@ -0,0 +1,74 @@
+import unittest
+
+import nearest_color
+import os
+import random
+import rgb
+import shutil
+import tempfile
+
+
+class NearestColorTests(unittest.TestCase):
+  def setUp(self):
+    self.old_cache_dir = os.environ.get('MAKECHR_CACHE_DIR')
+    self.tmpdir = tempfile.mkdtemp()
+    os.environ['MAKECHR_CACHE_DIR'] = self.tmpdir
+
+  def tearDown(self):
+    if self.old_cache_dir is None:
+      del os.environ['MAKECHR_CACHE_DIR']
+    else:
+      os.environ['MAKECHR_CACHE_DIR'] = self.old_cache_dir
+    shutil.rmtree(self.tmpdir)
+
+  def linear_scan(self, r, g, b):
+    found_nc = -1
+    found_diff = float('infinity')
+    for i,allow_val in enumerate(rgb.RGB_COLORS):
+      diff = (abs(r - allow_val / (256 * 256)) +
+              abs(g - (allow_val / 256) % 256) +
+              abs(b - allow_val % 256))
+      if diff < found_diff:
+        found_nc = i
+        found_diff = diff
+    if found_diff > rgb.COLOR_TOLERANCE:
+      return -1
+    return found_nc
+
+  def test_same_as_linear_scan(self):
+    table = nearest_color.NearestColorTable(rgb.RGB_COLORS,
+                                            rgb.COLOR_TOLERANCE)
+    table.build()
+    rand = random.Random(0)
+    for n in xrange(5000):
+      allow_val = rand.choice(rgb.RGB_COLORS)
+      r = min(max(allow_val / (256 * 256) + rand.randint(-40, 40), 0), 255)
+      g = min(max((allow_val / 256) % 256 + rand.randint(-40, 40), 0), 255)
+      b = min(max(allow_val % 256 + rand.randint(-40, 40), 0), 255)
+      self.assertEqual(table.find(r, g, b), self.linear_scan(r, g, b))
+
+  def test_exact_and_unknown_colors(self):
+    table = nearest_color.NearestColorTable(rgb.RGB_COLORS,
+                                            rgb.COLOR_TOLERANCE)
+    table.build()
+    self.assertEqual(table.find(0x00, 0x78, 0xf8), 0x11)
+    self.assertEqual(table.find(0x7c, 0x7c, 0x7c), 0x00)
+    self.assertEqual(table.find(0xff, 0x00, 0xff), -1)
+
+  def test_cache_round_trip(self):
+    table = nearest_color.NearestColorTable(rgb.RGB_COLORS,
+                                            rgb.COLOR_TOLERANCE)
+    self.assertFalse(table.load_cache())
+    table.load()
+    self.assertTrue(os.path.isfile(table.cache_filename()))
+    other = nearest_color.NearestColorTable(rgb.RGB_COLORS,
+                                            rgb.COLOR_TOLERANCE)
+    self.assertTrue(other.load_cache())
+    self.assertEqual(other.find(0x3c, 0xbc, 0xfc), 0x21)
+    # A different tolerance must not use the same cache file.
+    strict = nearest_color.NearestColorTable(rgb.RGB_COLORS, 8)
+    self.assertFalse(strict.load_cache())
+
+
+if __name__ == '__main__':
+  unittest.main()
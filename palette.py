@@ -1,3 +1,4 @@
+import color_mask
 import errors
 import string
 
@@ -6,7 +7,7 @@ class Palette(object):
   def __init__(self):
     self.bg_color = None
     self.pals = []
-    self.pal_as_sets = []
+    self.pal_as_masks = []
 
   def __str__(self):
     return ('P/' +
@@ -21,12 +22,20 @@ class Palette(object):
       raise errors.PaletteBgcolorError(self.bg_color, p)
     p = [self.bg_color] + [c for c in p if c != self.bg_color]
     self.pals.append(p)
-    self.pal_as_sets.append(set(p))
+    self.pal_as_masks.append(color_mask.to_mask(p))
 
   def select(self, color_needs):
-    want = set([c for c in color_needs if not c is None])
-    for i,p in enumerate(self.pal_as_sets):
-      if want <= p:
+    return self.select_mask(color_mask.to_mask(color_needs))
+
+  # select_mask
+  #
+  # Find the first PaletteOption that has every color in the bitmask.
+  #
+  # want: Bitmask of nescolors.
+  # Returns the index of the PaletteOption, and the PaletteOption.
+  def select_mask(self, want):
+    for i,p in enumerate(self.pal_as_masks):
+      if want & ~p == 0:
         break
     else:
       raise IndexError
@@ -47,7 +56,7 @@ class PaletteParser(object):
     for n in xrange(4):
       row = []
       val = self.fetch_hex()
-      if not val:
+      if val is None:
         break
       row.append(val)
       pal.set_bg_color(val)
@@ -55,7 +64,7 @@ class PaletteParser(object):
         if not self.fetch_literal('-'):
           break
         val = self.fetch_hex()
-        if not val:
+        if val is None:
           self.die('Invalid hex value')
         row.append(val)
       self.fetch_literal('/') or self.die('Expected: "/"')
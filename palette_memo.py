@@ -0,0 +1,165 @@
+import build_cache
+import collections
+import guess_best_palette
+import hashlib
+import nearest_color
+import os
+import tempfile
+
+
+DEFAULT_MAX_ENTRIES = 256
+DEFAULT_MAX_FILES = 4096
+
+
+# memo_dir
+#
+# Directory where guessed palettes are saved between runs.
+def memo_dir():
+  return os.path.join(nearest_color.cache_dir(), 'palettes')
+
+
+# PaletteMemo
+#
+# Remembers the palette guessed for a set of block color needs, so that
+# converting an image whose colors haven't changed skips the search. The
+# guess only depends on the minimal color sets, which are sorted, so images
+# that share them share an entry, even if their blocks are in another order
+# or some of their color sets are subsets of others. Only the first valid
+# palette is remembered, since other objectives also depend on the tiles.
+# Palettes are kept as text and parsed again on a hit, so that callers never
+# share a Palette object.
+#
+# Entries are kept in memory, and once full, the least recently used one is
+# dropped. With a directory, each entry is also saved in a file of its own,
+# so that it can be found by later runs, and by other processes running at
+# the same time. Files are written to a temporary name and then renamed, so
+# readers never see a partial entry. Once there are too many files, the
+# least recently used ones are removed.
+class PaletteMemo(object):
+  # max_entries: Maximum number of entries kept in memory.
+  # directory: Directory to save entries to, or None to only keep them in
+  #            memory.
+  # max_files: Maximum number of entries saved in the directory.
+  def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, directory=None,
+               max_files=DEFAULT_MAX_FILES):
+    self._max_entries = max_entries
+    self._dir = directory
+    self._max_files = max_files
+    self._entries = collections.OrderedDict()
+    self.hits = 0
+    self.misses = 0
+
+  # key
+  #
+  # Get the memo key for guessing a palette. Keys include the version of
+  # makechr, so that entries saved by an earlier version are never used.
+  #
+  # block_color_needs: List of block color needs.
+  # search_budget: Maximum number of steps to spend guessing, or None.
+  def key(self, block_color_needs, search_budget):
+    guesser = guess_best_palette.GuessBestPalette()
+    uniq_color_sets = guesser.get_uniq_color_sets(block_color_needs)
+    minimal_colors = guesser.get_minimal_colors(uniq_color_sets)
+    return '%s:%s:%s' % (build_cache.tool_version(), search_budget,
+                         ','.join(['%x' % c for c in minimal_colors]))
+
+  def get(self, key):
+    text = self._entries.pop(key, None)
+    if text is None and self._dir:
+      text = self.load_file(key)
+    if text is None:
+      self.misses += 1
+      return None
+    self.add_entry(key, text)
+    self.hits += 1
+    return text
+
+  def put(self, key, text):
+    self._entries.pop(key, None)
+    self.add_entry(key, text)
+    if self._dir:
+      self.save_file(key, text)
+
+  def add_entry(self, key, text):
+    self._entries[key] = text
+    while len(self._entries) > self._max_entries:
+      self._entries.popitem(last=False)
+
+  def size(self):
+    return len(self._entries)
+
+  def filename(self, key):
+    return os.path.join(self._dir, hashlib.sha1(key).hexdigest())
+
+  # load_file
+  #
+  # Get the palette saved for the key, or None if there isn't one.
+  def load_file(self, key):
+    filename = self.filename(key)
+    try:
+      fin = open(filename, 'r')
+      try:
+        lines = fin.read().split('\n')
+      finally:
+        fin.close()
+      # Mark as recently used.
+      os.utime(filename, None)
+    except (IOError, OSError):
+      return None
+    if len(lines) < 2 or lines[0] != key:
+      return None
+    return lines[1]
+
+  # save_file
+  #
+  # Save the palette for the key, then remove old files if needed. Failure
+  # to save is not an error.
+  def save_file(self, key, text):
+    try:
+      if not os.path.isdir(self._dir):
+        os.makedirs(self._dir)
+      (fd, tmpname) = tempfile.mkstemp(dir=self._dir, prefix='.tmp-')
+      fout = os.fdopen(fd, 'w')
+      fout.write('%s\n%s\n' % (key, text))
+      fout.close()
+      os.rename(tmpname, self.filename(key))
+    except (IOError, OSError):
+      return
+    self.evict()
+
+  # evict
+  #
+  # Remove the least recently used files until there are at most max_files.
+  def evict(self):
+    names = [name for name in os.listdir(self._dir)
+             if not name.startswith('.')]
+    if len(names) <= self._max_files:
+      return
+    files = []
+    for name in names:
+      filename = os.path.join(self._dir, name)
+      try:
+        files.append((os.path.getmtime(filename), filename))
+      except OSError:
+        # Removed by another process.
+        continue
+    files.sort()
+    for (mtime, filename) in files[:len(files) - self._max_files]:
+      try:
+        os.remove(filename)
+      except OSError:
+        pass
+
+
+_memo = None
+
+
+# get_memo
+#
+# Get the PaletteMemo shared by every conversion in this process, which saves
+# entries to memo_dir.
+def get_memo():
+  global _memo
+  if _memo is None:
+    _memo = PaletteMemo(directory=memo_dir())
+  return _memo
@@ -0,0 +1,127 @@
+import unittest
+
+import app
+import benchmark
+import image_processor
+import makechr
+import os
+import palette_memo
+import random
+import shutil
+import StringIO
+import sys
+import tempfile
+
+
+class PaletteMemoTests(unittest.TestCase):
+  def setUp(self):
+    self.tmpdir = tempfile.mkdtemp()
+
+  def tearDown(self):
+    shutil.rmtree(self.tmpdir)
+
+  def test_evicts_least_recently_used(self):
+    memo = palette_memo.PaletteMemo(max_entries=2)
+    keys = [memo.key([set([0x0f, n])], None) for n in xrange(3)]
+    memo.put(keys[0], 'P/0f-00/')
+    memo.put(keys[1], 'P/0f-01/')
+    self.assertEqual(memo.get(keys[0]), 'P/0f-00/')
+    memo.put(keys[2], 'P/0f-02/')
+    self.assertEqual(memo.size(), 2)
+    self.assertEqual(memo.get(keys[1]), None)
+    self.assertEqual(memo.get(keys[2]), 'P/0f-02/')
+    self.assertEqual((memo.hits, memo.misses), (2, 1))
+
+  def test_key(self):
+    memo = palette_memo.PaletteMemo()
+    needs = [set([0x0f, 0x01]), set([0x0f, 0x16])]
+    # Order, duplicates and subsets of other color sets don't matter.
+    self.assertEqual(memo.key(needs, None),
+                     memo.key([set([0x16]), needs[1], needs[0], needs[1]],
+                              None))
+    self.assertNotEqual(memo.key(needs, None), memo.key(needs[:1], None))
+    self.assertNotEqual(memo.key(needs, None), memo.key(needs, 100))
+
+  def test_saved_to_directory(self):
+    memo = palette_memo.PaletteMemo(directory=self.tmpdir)
+    key = memo.key([set([0x0f, 0x01])], None)
+    memo.put(key, 'P/0f-01/')
+    # Another process, or a later run, finds the entry.
+    other = palette_memo.PaletteMemo(directory=self.tmpdir)
+    self.assertEqual(other.get(key), 'P/0f-01/')
+    self.assertEqual(other.get(memo.key([set([0x0f, 0x02])], None)), None)
+    self.assertEqual((other.hits, other.misses), (1, 1))
+
+  def test_evicts_files(self):
+    memo = palette_memo.PaletteMemo(directory=self.tmpdir, max_files=2)
+    keys = [memo.key([set([0x0f, n])], None) for n in xrange(3)]
+    for n, key in enumerate(keys):
+      memo.put(key, 'P/0f-%02x/' % n)
+      os.utime(memo.filename(key), (n, n))
+    self.assertEqual(len(os.listdir(self.tmpdir)), 2)
+    other = palette_memo.PaletteMemo(directory=self.tmpdir)
+    self.assertEqual(other.get(keys[0]), None)
+    self.assertEqual(other.get(keys[2]), 'P/0f-02/')
+
+  def test_process_image(self):
+    memo = palette_memo.PaletteMemo()
+    img = benchmark.make_mergeable(random.Random(0))
+    palettes = []
+    for n in xrange(2):
+      processor = image_processor.ImageProcessor(palette_memo=memo)
+      processor.process_image(img, None, None)
+      self.assertFalse(processor.err().has())
+      palettes.append(str(processor.palette()))
+    self.assertEqual(palettes[0], palettes[1])
+    self.assertEqual((memo.hits, memo.misses), (1, 1))
+
+  def test_process_image_saved_palette_with_color_zero(self):
+    img = benchmark.make_max_palettes(random.Random(0))
+    palettes = []
+    for n in xrange(2):
+      memo = palette_memo.PaletteMemo(directory=self.tmpdir)
+      processor = image_processor.ImageProcessor(palette_memo=memo)
+      processor.process_image(img, None, None)
+      self.assertFalse(processor.err().has())
+      palettes.append(str(processor.palette()))
+    self.assertIn('-00/', palettes[0])
+    self.assertEqual(palettes[0], palettes[1])
+    self.assertEqual(memo.hits, 1)
+
+  def test_unreadable_entry_is_a_miss(self):
+    img = benchmark.make_max_palettes(random.Random(0))
+    memo = palette_memo.PaletteMemo(directory=self.tmpdir)
+    processor = image_processor.ImageProcessor(palette_memo=memo)
+    processor.load_image(img)
+    processor.scan_image(img)
+    memo.put(processor.palette_memo_key(), 'P/zz/')
+    processor.process_palette(None)
+    self.assertFalse(processor.err().has())
+    self.assertEqual(str(processor.palette()),
+                     'P/0f-21-11-01/0f-26-16-06/0f-29-19-09/0f-30-10-00/')
+
+  def test_turned_off(self):
+    memo = palette_memo.PaletteMemo(directory=self.tmpdir)
+    img = benchmark.make_mergeable(random.Random(0))
+    args = makechr.make_parser().parse_args(
+      ['-X', '--no-palette-memo', '-o', os.path.join(self.tmpdir, '%s.dat')])
+    application = app.Application(palette_memo=memo)
+    real_stdout = sys.stdout
+    sys.stdout = StringIO.StringIO()
+    try:
+      self.assertTrue(application.run(img, args))
+    finally:
+      sys.stdout = real_stdout
+    self.assertEqual((memo.hits, memo.misses, memo.size()), (0, 0, 0))
+
+  def test_not_used_with_objective(self):
+    memo = palette_memo.PaletteMemo()
+    img = benchmark.make_mergeable(random.Random(0))
+    processor = image_processor.ImageProcessor(palette_objective='tiles',
+                                               palette_memo=memo)
+    processor.process_image(img, None, None)
+    self.assertEqual(memo.size(), 0)
+
+
+if __name__ == '__main__':
+  unittest.main()
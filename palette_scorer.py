@@ -0,0 +1,65 @@
+# Ways to choose between valid palettes. "first" uses the first palette found,
+# "tiles" the one needing the fewest chr tiles, and "palettes" the one with
+# the fewest PaletteOptions. Ties are broken by the other measure.
+OBJECTIVES = ['first', 'tiles', 'palettes']
+
+
+# TileCountScorer
+#
+# Rates a palette by how many unique chr tiles the image would need with it,
+# the same count that ImageProcessor.make_nametable would produce. Tiles
+# are grouped up front by their color needs, dot profile and block color
+# needs, so that rating a palette only looks at each group once, rather than
+# processing the image again.
+class TileCountScorer(object):
+  def __init__(self, color_manifest, block_color_manifest, objective='tiles'):
+    self._color_manifest = color_manifest
+    self._block_color_manifest = block_color_manifest
+    self._objective = objective
+    self._tiles = set()
+
+  # add_tile
+  #
+  # Add a tile to be counted.
+  #
+  # cid: Id of the tile's color needs.
+  # did: Id of the tile's dot profile.
+  # bcid: Id of the color needs of the block the tile is in.
+  def add_tile(self, cid, did, bcid):
+    self._tiles.add((cid, did, bcid))
+
+  # count_tiles
+  #
+  # Count the unique chr tiles needed when using the palette.
+  #
+  # pal: A Palette.
+  def count_tiles(self, pal):
+    options = {}
+    xlats = {}
+    keys = set()
+    for (cid, did, bcid) in self._tiles:
+      if not (cid, bcid) in xlats:
+        if not bcid in options:
+          block_color_needs = self._block_color_manifest.get(bcid)
+          options[bcid] = pal.select(block_color_needs)[1]
+        option = options[bcid]
+        color_needs = self._color_manifest.get(cid)
+        xlats[(cid, bcid)] = tuple([option.index(c) for c in color_needs
+                                    if not c is None])
+      xlat = xlats[(cid, bcid)]
+      # Tiles without any colors don't produce chr.
+      if xlat:
+        keys.add((did, xlat))
+    return len(keys)
+
+  # score
+  #
+  # Rate the palette according to the objective, lower is better.
+  #
+  # pal: A Palette.
+  def score(self, pal):
+    num_tiles = self.count_tiles(pal)
+    num_palettes = len(pal.pals)
+    if self._objective == 'palettes':
+      return (num_palettes, num_tiles)
+    return (num_tiles, num_palettes)
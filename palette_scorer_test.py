@@ -0,0 +1,43 @@
+import unittest
+
+import id_manifest
+import palette
+import palette_scorer
+
+
+class PaletteScorerTests(unittest.TestCase):
+  def setUp(self):
+    color_manifest = id_manifest.IdManifest()
+    block_color_manifest = id_manifest.IdManifest()
+    self.scorers = {}
+    for objective in ['tiles', 'palettes']:
+      self.scorers[objective] = palette_scorer.TileCountScorer(
+        color_manifest, block_color_manifest, objective)
+    # Two blocks, each with a single tile of the same shape in its own color,
+    # plus an empty tile that doesn't need chr.
+    dots = [0] * 32 + [1] * 32
+    for (color_needs, dot_profile) in [([0x0f, 0x01, None, None], dots),
+                                       ([0x0f, 0x02, None, None], dots),
+                                       ([None] * 4, [0] * 64)]:
+      cid = color_manifest.id(color_needs)
+      bcid = block_color_manifest.id(set(color_needs) - set([None]))
+      for scorer in self.scorers.values():
+        scorer.add_tile(cid, hash(str(dot_profile)), bcid)
+    parser = palette.PaletteParser()
+    self.merged = parser.parse('P/0f-01-02/')
+    self.split = parser.parse('P/0f-01/0f-02/')
+
+  def test_count_tiles(self):
+    scorer = self.scorers['tiles']
+    self.assertEqual(scorer.count_tiles(self.merged), 2)
+    self.assertEqual(scorer.count_tiles(self.split), 1)
+
+  def test_objectives(self):
+    scorer = self.scorers['tiles']
+    self.assertTrue(scorer.score(self.split) < scorer.score(self.merged))
+    scorer = self.scorers['palettes']
+    self.assertTrue(scorer.score(self.merged) < scorer.score(self.split))
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -13,6 +13,15 @@ class PaletteTests(unittest.TestCase):
     pal = parser.parse('P/0f-01-02-03/0f-04-05-06/0f-10/')
     self.assertEqual(str(pal), 'P/0f-01-02-03/0f-04-05-06/0f-10/')
 
+  def test_parser_color_zero(self):
+    parser = palette.PaletteParser()
+    pal = parser.parse('P/0f-30-10-00/')
+    self.assertEqual(pal.get(0), [0x0f, 0x30, 0x10, 0x00])
+    self.assertEqual(str(pal), 'P/0f-30-10-00/')
+    pal = parser.parse('P/00-01/00-30-10/')
+    self.assertEqual(pal.bg_color, 0x00)
+    self.assertEqual(str(pal), 'P/00-01/00-30-10/')
+
   def test_parser_bad_hex(self):
     parser = palette.PaletteParser()
     with self.assertRaises(errors.PaletteParseError) as cm:
@@ -37,6 +46,17 @@ class PaletteTests(unittest.TestCase):
     self.assertTrue('Expected: "/"' in cm.exception.msg)
     self.assertTrue((' ' * 13 + '^') in str(cm.exception))
 
+  def test_select(self):
+    parser = palette.PaletteParser()
+    pal = parser.parse('P/0f-01-02-03/0f-04-05-06/0f-10/')
+    self.assertEqual(pal.select([0x0f, None, None, None]),
+                     (0, [0x0f, 0x01, 0x02, 0x03]))
+    self.assertEqual(pal.select([0x05, 0x0f, 0x04, None]),
+                     (1, [0x0f, 0x04, 0x05, 0x06]))
+    self.assertEqual(pal.select([0x10, None, None, None]), (2, [0x0f, 0x10]))
+    with self.assertRaises(IndexError):
+      pal.select([0x01, 0x04, None, None])
+
 
 if __name__ == '__main__':
   unittest.main()
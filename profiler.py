@@ -0,0 +1,117 @@
+import json
+import time
+
+
+FORMATS = ['table', 'json']
+
+
+class Stage(object):
+  def __init__(self, profiler, name):
+    self._profiler = profiler
+    self._name = name
+    self._start = None
+
+  def __enter__(self):
+    self._start = time.time()
+    return self
+
+  def __exit__(self, *exc_info):
+    self._profiler.add_time(self._name, time.time() - self._start)
+    return False
+
+
+# Profiler
+#
+# Collects the time spent in each stage of a conversion, along with counters
+# such as how many pixels were scanned. Stages and counters are kept in the
+# order they were first seen, and add up if seen again, so a single profiler
+# can be used for an entire batch.
+class Profiler(object):
+  def __init__(self):
+    self._times = {}
+    self._counters = {}
+    self._order = []
+
+  # stage
+  #
+  # Time a stage, for use in a with statement.
+  #
+  # name: Name of the stage.
+  def stage(self, name):
+    return Stage(self, name)
+
+  def add_time(self, name, seconds):
+    if not name in self._times:
+      self._times[name] = 0.0
+      self._order.append(name)
+    self._times[name] += seconds
+
+  # count
+  #
+  # Add to a counter.
+  #
+  # name: Name of the counter.
+  # num: Amount to add.
+  def count(self, name, num=1):
+    if not name in self._counters:
+      self._counters[name] = 0
+      self._order.append(name)
+    self._counters[name] += num
+
+  def times(self):
+    return [(name, self._times[name]) for name in self._order
+            if name in self._times]
+
+  def counters(self):
+    return [(name, self._counters[name]) for name in self._order
+            if name in self._counters]
+
+  def to_json(self):
+    return json.dumps({'stages': dict(self.times()),
+                       'counters': dict(self.counters())}, sort_keys=True)
+
+  def to_table(self):
+    lines = ['{0:<28}{1:>10}'.format('Stage', 'ms')]
+    for (name, seconds) in self.times():
+      lines.append('{0:<28}{1:>10.1f}'.format(name, seconds * 1000))
+    lines.append('{0:<28}{1:>10}'.format('Counter', 'count'))
+    for (name, num) in self.counters():
+      lines.append('{0:<28}{1:>10}'.format(name, num))
+    return '\n'.join(lines) + '\n'
+
+  # get_report
+  #
+  # Get the report in the format, one of FORMATS.
+  def get_report(self, format):
+    if format == 'json':
+      return self.to_json() + '\n'
+    return self.to_table()
+
+
+class NullStage(object):
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *exc_info):
+    return False
+
+
+_null_stage = NullStage()
+
+
+# NullProfiler
+#
+# Profiler that does nothing, used when profiling is off so that callers
+# don't need to check.
+class NullProfiler(object):
+  def stage(self, name):
+    return _null_stage
+
+  def add_time(self, name, seconds):
+    pass
+
+  def count(self, name, num=1):
+    pass
+
+
+NULL_PROFILER = NullProfiler()
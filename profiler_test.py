@@ -0,0 +1,57 @@
+import unittest
+
+import benchmark
+import image_processor
+import json
+import profiler
+import random
+
+
+class ProfilerTests(unittest.TestCase):
+  def test_report(self):
+    prof = profiler.Profiler()
+    prof.add_time('scan', 0.5)
+    prof.count('pixels scanned', 64)
+    prof.add_time('chr', 0.25)
+    prof.add_time('scan', 0.5)
+    prof.count('pixels scanned', 64)
+    self.assertEqual(prof.times(), [('scan', 1.0), ('chr', 0.25)])
+    self.assertEqual(prof.counters(), [('pixels scanned', 128)])
+    self.assertEqual(prof.get_report('table').split('\n'),
+                     ['Stage                               ms',
+                      'scan                            1000.0',
+                      'chr                              250.0',
+                      'Counter                          count',
+                      'pixels scanned                     128',
+                      ''])
+    self.assertEqual(json.loads(prof.get_report('json')),
+                     {'stages': {'scan': 1.0, 'chr': 0.25},
+                      'counters': {'pixels scanned': 128}})
+
+  def test_stage(self):
+    prof = profiler.Profiler()
+    with prof.stage('load'):
+      pass
+    self.assertEqual([name for (name, seconds) in prof.times()], ['load'])
+
+  def test_null_profiler(self):
+    with profiler.NULL_PROFILER.stage('load'):
+      profiler.NULL_PROFILER.count('pixels scanned')
+
+  def test_process_image(self):
+    prof = profiler.Profiler()
+    img = benchmark.make_max_palettes(random.Random(0))
+    processor = image_processor.ImageProcessor(profiler=prof)
+    processor.process_image(img, None, None)
+    self.assertFalse(processor.err().has())
+    self.assertEqual([name for (name, seconds) in prof.times()],
+                     ['load', 'scan', 'palette', 'attributes', 'chr'])
+    counters = dict(prof.counters())
+    self.assertEqual(counters['pixels scanned'], 256 * 240)
+    self.assertEqual(counters['tiles with chr'], 32 * 30)
+    self.assertEqual(counters['tiles with chr'] - counters['tiles deduped'],
+                     len(processor.chr_data()))
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -14,19 +14,26 @@ class RomBuilder(object):
     self.rom_vectors = '\x00\x00\x20\xc4\x00\x00'
     self.fill_size = 0x3b61
 
-  def copy_file(self, fout, filename):
-    fin = open(filename, 'rb')
-    fout.write(fin.read())
-    fin.close()
-
-  def build(self, binfiles, outfile):
-    fout = open(outfile, 'wb')
-    fout.write(self.rom_header)
-    self.copy_file(fout, binfiles.fill_template('palette'))
-    self.copy_file(fout, binfiles.fill_template('nametable'))
-    self.copy_file(fout, binfiles.fill_template('attribute'))
-    fout.write(self.rom_code)
-    fout.write('\x00' * self.fill_size)
-    fout.write(self.rom_vectors)
-    self.copy_file(fout, binfiles.fill_template('chr'))
-    fout.close()
+  # build
+  #
+  # Assemble an iNES rom that displays the image, from the outputs of a
+  # BinaryOutput. The rom is put together in a single buffer. Returns the
+  # bytes of the rom, after writing them to the outfile if one is given.
+  #
+  # binfiles: BinaryOutput that has saved all four outputs.
+  # outfile: Filename to write the rom to, or None.
+  def build(self, binfiles, outfile=None):
+    rom = bytearray(self.rom_header)
+    rom += binfiles.get_product('palette')
+    rom += binfiles.get_product('nametable')
+    rom += binfiles.get_product('attribute')
+    rom += self.rom_code
+    rom += bytearray(self.fill_size)
+    rom += self.rom_vectors
+    rom += binfiles.get_product('chr')
+    rom = bytes(rom)
+    if outfile:
+      fout = open(outfile, 'wb')
+      fout.write(rom)
+      fout.close()
+    return rom
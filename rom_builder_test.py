@@ -0,0 +1,25 @@
+import unittest
+
+import artifact_table
+import binary_output
+import palette
+import rom_builder
+
+
+class RomBuilderTests(unittest.TestCase):
+  def test_build_in_memory(self):
+    output = binary_output.BinaryOutput()
+    output.save_nametable(artifact_table.ArtifactTable())
+    output.save_chr([])
+    output.save_palette(palette.PaletteParser().parse('P/0f-01-02/'))
+    output.save_attribute(artifact_table.ArtifactTable())
+    rom = rom_builder.RomBuilder().build(output)
+    # Header, then 16k of prg, then 8k of chr.
+    self.assertEqual(len(rom), 16 + 16384 + 8192)
+    self.assertEqual(rom[:4], 'NES\x1a')
+    self.assertEqual(rom[16:20], '\x0f\x01\x02\x0f')
+    self.assertEqual(rom[16 + 16384 - 6:16 + 16384], '\x00\x00\x20\xc4\x00\x00')
+
+
+if __name__ == '__main__':
+  unittest.main()
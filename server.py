@@ -0,0 +1,186 @@
+import app
+import argparse
+from errors import CommandLineArgError
+import json
+import makechr
+import nearest_color
+import os
+import palette_memo
+from PIL import Image
+import SocketServer
+import stat
+import StringIO
+import sys
+import time
+import view_renderer
+
+
+# Options that a request can't use, since they convert more than a single
+# image or keep running.
+UNSUPPORTED_OPTIONS = [('level', '--level'), ('manifest', '--manifest'),
+                       ('shared_chr', '--shared-chr'), ('watch', '--watch')]
+
+
+# ConversionServer
+#
+# Converts images for requests from a long-running process, so that each
+# conversion doesn't pay for starting python, importing modules and loading
+# tables. Everything that is loaded once and then kept in memory, such as
+# the nearest color table, rgb.RGB_XLAT and the nametable view font, stays
+# warm between requests, and palettes are remembered by their color needs.
+#
+# A request is a json object with "args", a list of the same command-line
+# arguments that makechr.py takes, and an optional "id" that is copied to
+# the response. Outputs are written to the files named by the arguments, the
+# same as makechr.py, relative to the directory of the server. The response
+# has "ok", "log" with the text makechr.py would have shown, "outputs" from
+# kind of output to filename, and "error" if the request could not be run.
+class ConversionServer(object):
+  def __init__(self, max_palettes=palette_memo.DEFAULT_MAX_ENTRIES):
+    self.palette_memo = palette_memo.PaletteMemo(max_palettes,
+                                                 palette_memo.memo_dir())
+    self.parser = makechr.make_parser()
+    self.parser.error = self.arg_error
+    self.parser.exit = self.arg_exit
+
+  def arg_error(self, msg):
+    raise CommandLineArgError(msg)
+
+  # arg_exit
+  #
+  # Called by the parser instead of exiting, such as after showing the help
+  # for "-h", so that the request is answered and the server keeps running.
+  def arg_exit(self, status=0, message=None):
+    raise CommandLineArgError((message or '').strip() or
+                              'Request has nothing to convert')
+
+  # warm_up
+  #
+  # Load everything that would otherwise be loaded by the first request.
+  def warm_up(self):
+    nearest_color.get_table()
+    view_renderer.ViewRenderer().load_nt_font()
+
+  def parse_args(self, argv):
+    if not isinstance(argv, list):
+      raise CommandLineArgError('Request "args" must be a list')
+    args = self.parser.parse_args([str(a) for a in argv])
+    if len(args.input) != 1:
+      raise CommandLineArgError('Request needs a single input image')
+    for (option, flag) in UNSUPPORTED_OPTIONS:
+      if getattr(args, option):
+        raise CommandLineArgError('%s can not be used in a request' % flag)
+    args.input = args.input[0]
+    return args
+
+  # handle
+  #
+  # Run a single request, returning the response.
+  #
+  # request: Dict decoded from the json request.
+  def handle(self, request):
+    start = time.time()
+    response = {'id': request.get('id'), 'ok': False, 'outputs': {}}
+    real_stdout = sys.stdout
+    sys.stdout = StringIO.StringIO()
+    try:
+      args = self.parse_args(request.get('args'))
+      try:
+        img = Image.open(args.input)
+      except IOError:
+        raise CommandLineArgError('Input file not found: "%s"' % args.input)
+      application = app.Application(palette_memo=self.palette_memo)
+      response['ok'] = application.run(img, args)
+      if response['ok']:
+        response['outputs'] = application.output_targets(args)
+    except (CommandLineArgError, IOError) as e:
+      response['error'] = str(e)
+    except Exception as e:
+      # A failed conversion must not take down the server, so that later
+      # requests are still answered.
+      response['ok'] = False
+      response['outputs'] = {}
+      response['error'] = '%s: %s' % (type(e).__name__, e)
+    finally:
+      response['log'] = sys.stdout.getvalue()
+      sys.stdout = real_stdout
+    response['elapsed_ms'] = (time.time() - start) * 1000
+    return response
+
+  # handle_line
+  #
+  # Run the request on a single line of json, returning the response as a
+  # line of json.
+  def handle_line(self, line):
+    try:
+      request = json.loads(line)
+      if not isinstance(request, dict):
+        raise ValueError('not an object')
+    except ValueError as e:
+      response = {'id': None, 'ok': False, 'outputs': {}, 'log': '',
+                  'error': 'Could not read request: %s' % e}
+    else:
+      response = self.handle(request)
+    return json.dumps(response, sort_keys=True) + '\n'
+
+  # serve_stream
+  #
+  # Answer requests, one per line, until the input is closed.
+  #
+  # fin: File to read requests from.
+  # fout: File to write responses to.
+  def serve_stream(self, fin, fout):
+    for line in iter(fin.readline, ''):
+      if not line.strip():
+        continue
+      fout.write(self.handle_line(line))
+      fout.flush()
+
+  # serve_socket
+  #
+  # Answer requests from clients connecting to a unix socket, one client at
+  # a time, so that every request shares the same caches.
+  #
+  # path: Filename of the socket.
+  def serve_socket(self, path):
+    server = self
+    class Handler(SocketServer.StreamRequestHandler):
+      def handle(self):
+        server.serve_stream(self.rfile, self.wfile)
+    # Remove the socket left behind by an earlier server.
+    if os.path.exists(path) and stat.S_ISSOCK(os.stat(path).st_mode):
+      os.remove(path)
+    socket_server = SocketServer.UnixStreamServer(path, Handler)
+    try:
+      socket_server.serve_forever()
+    finally:
+      socket_server.server_close()
+      os.remove(path)
+
+
+def run():
+  parser = argparse.ArgumentParser(description='Convert images for requests '
+                                   'sent as lines of json, keeping caches '
+                                   'warm between them')
+  parser.add_argument('--socket', dest='socket', metavar='path',
+                      help='unix socket to listen on, default is to read '
+                      'stdin and write stdout')
+  parser.add_argument('--palette-memo-size', dest='palette_memo_size',
+                      metavar='N', type=int,
+                      default=palette_memo.DEFAULT_MAX_ENTRIES,
+                      help='number of guessed palettes to remember')
+  args = parser.parse_args()
+  server = ConversionServer(args.palette_memo_size)
+  server.warm_up()
+  try:
+    if args.socket:
+      sys.stderr.write('Listening on "%s"\n' % args.socket)
+      server.serve_socket(args.socket)
+    else:
+      server.serve_stream(sys.stdin, sys.stdout)
+  except KeyboardInterrupt:
+    pass
+
+
+if __name__ == '__main__':
+  run()
@@ -0,0 +1,122 @@
+import unittest
+
+import benchmark
+import json
+import os
+import random
+import server
+import shutil
+import StringIO
+import tempfile
+
+
+class ServerTests(unittest.TestCase):
+  def setUp(self):
+    self.tmpdir = tempfile.mkdtemp()
+    # Keep saved palettes from other runs out of the test.
+    self.real_cache_dir = os.environ.get('MAKECHR_CACHE_DIR')
+    os.environ['MAKECHR_CACHE_DIR'] = self.tmpdir
+    self.server = server.ConversionServer()
+
+  def tearDown(self):
+    if self.real_cache_dir is None:
+      del os.environ['MAKECHR_CACHE_DIR']
+    else:
+      os.environ['MAKECHR_CACHE_DIR'] = self.real_cache_dir
+    shutil.rmtree(self.tmpdir)
+
+  def convert_args(self, input, name):
+    return ['-X', input, '-o', os.path.join(self.tmpdir, name + '-%s.dat')]
+
+  def test_handle(self):
+    response = self.server.handle({
+      'id': 7, 'args': self.convert_args('testdata/blue-tile.png', 'a')})
+    self.assertEqual(response['id'], 7)
+    self.assertTrue(response['ok'])
+    self.assertIn('Number of tiles: 1\n', response['log'])
+    self.assertEqual(response['outputs']['chr'],
+                     os.path.join(self.tmpdir, 'a-chr.dat'))
+    self.assertTrue(os.path.isfile(response['outputs']['chr']))
+    # The palette is remembered for the next request.
+    response = self.server.handle({
+      'args': self.convert_args('testdata/blue-tile.png', 'b')})
+    self.assertTrue(response['ok'])
+    self.assertEqual(self.server.palette_memo.hits, 1)
+
+  def test_conversion_errors(self):
+    response = self.server.handle({
+      'args': self.convert_args('testdata/palette-overflow-tile.png', 'a')})
+    self.assertFalse(response['ok'])
+    self.assertIn('PaletteOverflowError', response['log'])
+    self.assertEqual(response['outputs'], {})
+
+  def test_remembered_palette(self):
+    filename = os.path.join(self.tmpdir, 'max.png')
+    benchmark.make_max_palettes(random.Random(0)).save(filename)
+    for name in ['a', 'b']:
+      response = self.server.handle({'args': self.convert_args(filename,
+                                                               name)})
+      self.assertTrue(response['ok'])
+      self.assertIn('0f-30-10-00/', response['log'])
+    self.assertEqual(self.server.palette_memo.hits, 1)
+
+  def test_unexpected_error(self):
+    def fail(img, args):
+      raise OverflowError('unsigned byte integer is greater than maximum')
+    real_run = server.app.Application.run
+    server.app.Application.run = lambda self, img, args: fail(img, args)
+    try:
+      response = self.server.handle({
+        'args': self.convert_args('testdata/blue-tile.png', 'a')})
+    finally:
+      server.app.Application.run = real_run
+    self.assertFalse(response['ok'])
+    self.assertEqual(response['error'], 'OverflowError: unsigned byte '
+                     'integer is greater than maximum')
+    # The server keeps answering requests.
+    response = self.server.handle({
+      'args': self.convert_args('testdata/blue-tile.png', 'b')})
+    self.assertTrue(response['ok'])
+
+  def test_bad_requests(self):
+    response = self.server.handle({'args': ['-X', '--bogus']})
+    self.assertEqual(response['error'], 'unrecognized arguments: --bogus')
+    response = self.server.handle({'args': ['-X', 'a.png', 'b.png']})
+    self.assertEqual(response['error'], 'Request needs a single input image')
+    response = self.server.handle({'args': ['-X', 'a.png', '--level']})
+    self.assertEqual(response['error'], '--level can not be used in a request')
+    response = self.server.handle({'args': ['-X', 'missing.png']})
+    self.assertEqual(response['error'], 'Input file not found: "missing.png"')
+
+  def test_help(self):
+    requests = [json.dumps({'id': 1, 'args': ['-h']}),
+                json.dumps({'id': 2, 'args': self.convert_args(
+                  'testdata/blue-tile.png', 'a')})]
+    fout = StringIO.StringIO()
+    self.server.serve_stream(StringIO.StringIO('\n'.join(requests) + '\n'),
+                             fout)
+    responses = [json.loads(line) for line in fout.getvalue().splitlines()]
+    self.assertEqual([r['id'] for r in responses], [1, 2])
+    self.assertFalse(responses[0]['ok'])
+    self.assertIn('usage:', responses[0]['log'])
+    self.assertEqual(responses[0]['error'], 'Request has nothing to convert')
+    # The server keeps answering requests.
+    self.assertTrue(responses[1]['ok'])
+
+  def test_serve_stream(self):
+    requests = [json.dumps({'id': 1, 'args': self.convert_args(
+                  'testdata/blue-tile.png', 'a')}),
+                '',
+                'not json']
+    fout = StringIO.StringIO()
+    self.server.serve_stream(StringIO.StringIO('\n'.join(requests) + '\n'),
+                             fout)
+    responses = [json.loads(line) for line in fout.getvalue().splitlines()]
+    self.assertEqual(len(responses), 2)
+    self.assertTrue(responses[0]['ok'])
+    self.assertFalse(responses[1]['ok'])
+    self.assertTrue(responses[1]['error'].startswith('Could not read'))
+
+
+if __name__ == '__main__':
+  unittest.main()
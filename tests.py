@@ -1,11 +1,65 @@
+import os
+import shutil
+import tempfile
 import unittest
 
+import array_scanner
+import array_scanner_test
+import artifact_table_test
+import batch_test
+import benchmark_test
+import binary_output_test
+import build_cache_test
+import chr_bank_test
+import chr_tile_test
+import guess_best_palette_test
+import id_manifest_test
+import image_processor_test
+import level_processor_test
+import nearest_color_test
+import palette_scorer_test
+import palette_memo_test
 import palette_test
+import profiler_test
+import rom_builder_test
+import server_test
+import tile_index_test
 import tile_test
+import watcher_test
 
 
 suite = unittest.TestSuite()
 suite.addTest(unittest.makeSuite(tile_test.TileTests))
+suite.addTest(unittest.makeSuite(
+    image_processor_test.ImageProcessorTests))
+suite.addTest(unittest.makeSuite(id_manifest_test.IdManifestTests))
+suite.addTest(unittest.makeSuite(chr_tile_test.ChrTileTests))
+suite.addTest(unittest.makeSuite(tile_index_test.TileIndexTests))
+suite.addTest(unittest.makeSuite(chr_bank_test.ChrBankTests))
+suite.addTest(unittest.makeSuite(artifact_table_test.ArtifactTableTests))
 suite.addTest(unittest.makeSuite(palette_test.PaletteTests))
-runner = unittest.TextTestRunner()
-runner.run(suite)
+suite.addTest(unittest.makeSuite(palette_scorer_test.PaletteScorerTests))
+suite.addTest(unittest.makeSuite(palette_memo_test.PaletteMemoTests))
+suite.addTest(unittest.makeSuite(rom_builder_test.RomBuilderTests))
+suite.addTest(unittest.makeSuite(nearest_color_test.NearestColorTests))
+suite.addTest(unittest.makeSuite(batch_test.BatchTests))
+suite.addTest(unittest.makeSuite(server_test.ServerTests))
+suite.addTest(unittest.makeSuite(watcher_test.WatcherTests))
+suite.addTest(unittest.makeSuite(benchmark_test.BenchmarkTests))
+suite.addTest(unittest.makeSuite(profiler_test.ProfilerTests))
+suite.addTest(unittest.makeSuite(level_processor_test.LevelProcessorTests))
+suite.addTest(unittest.makeSuite(binary_output_test.BinaryOutputTests))
+suite.addTest(unittest.makeSuite(build_cache_test.BuildCacheTests))
+suite.addTest(unittest.makeSuite(
+    guess_best_palette_test.GuessBestPaletteTests))
+if array_scanner.is_available():
+  suite.addTest(unittest.makeSuite(array_scanner_test.ArrayScannerTests))
+# Keep the lookup table and saved palettes out of the real cache, so that
+# tests never depend on earlier runs.
+cache_dir = tempfile.mkdtemp()
+os.environ['MAKECHR_CACHE_DIR'] = cache_dir
+try:
+  runner = unittest.TextTestRunner()
+  runner.run(suite)
+finally:
+  shutil.rmtree(cache_dir)
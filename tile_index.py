@@ -0,0 +1,168 @@
+import chr_tile
+
+
+FLIP_H = 1
+FLIP_V = 2
+ALL_FLIPS = [0, FLIP_H, FLIP_V, FLIP_H | FLIP_V]
+
+# Each byte with its bits in reverse order, to flip a row of a bit plane.
+REVERSE_BITS = [int('{0:08b}'.format(b)[::-1], 2) for b in xrange(256)]
+
+# For the matching nibbles of the low and high bit planes, packed as
+# (low << 4) | high, the values of those four pixels.
+PIXELS = [tuple([(low >> (3 - k) & 1) | ((hi >> (3 - k) & 1) << 1)
+                 for k in xrange(4)])
+          for low in xrange(16) for hi in xrange(16)]
+
+
+# flip_bytes
+#
+# Flip the 16 bytes of a chr tile.
+#
+# data: Bytes of the tile.
+# flags: Combination of FLIP_H and FLIP_V.
+def flip_bytes(data, flags):
+  data = bytearray(data)
+  low = data[:8]
+  hi = data[8:]
+  if flags & FLIP_H:
+    low = bytearray([REVERSE_BITS[b] for b in low])
+    hi = bytearray([REVERSE_BITS[b] for b in hi])
+  if flags & FLIP_V:
+    low.reverse()
+    hi.reverse()
+  return bytes(low + hi)
+
+
+# get_pixel_rows
+#
+# Get the pixels of a chr tile, as 8 rows of 8 values each 0..3.
+#
+# data: Bytes of the tile.
+def get_pixel_rows(data):
+  data = bytearray(data)
+  rows = []
+  for y in xrange(8):
+    (low, hi) = (data[y], data[y + 8])
+    rows.append(PIXELS[(low & 0xf0) | (hi >> 4)] +
+                PIXELS[((low & 0x0f) << 4) | (hi & 0x0f)])
+  return rows
+
+
+# flip_pixel_rows
+#
+# Flip the rows of pixels from get_pixel_rows.
+def flip_pixel_rows(rows, flags):
+  if flags & FLIP_H:
+    rows = [row[::-1] for row in rows]
+  if flags & FLIP_V:
+    rows = rows[::-1]
+  return rows
+
+
+# renumber_colors
+#
+# Renumber the pixel values by order of first appearance, the same way that
+# dot profiles are numbered, so that tiles which only differ in which colors
+# they use get the same result.
+def renumber_colors(rows):
+  order = {}
+  result = bytearray(64)
+  k = 0
+  for row in rows:
+    for p in row:
+      n = order.get(p)
+      if n is None:
+        n = order[p] = len(order)
+      result[k] = n
+      k += 1
+  return bytes(result)
+
+
+# TileIndex
+#
+# Deduplicates chr tiles that are the same up to flips, or up to the colors
+# they use, or both. Each tile is reduced to a canonical key, the smallest of
+# the keys of its allowed variations, so finding matches only needs one dict
+# lookup per tile rather than comparing tiles to each other.
+class TileIndex(object):
+  # flips: Whether tiles that are horizontal or vertical flips of each other
+  #        are the same, as they are for sprites.
+  # any_colors: Whether tiles with the same shape but different colors are
+  #             the same. The tiles kept are then only useful for counting,
+  #             since they can't stand in for the others.
+  def __init__(self, flips=False, any_colors=False):
+    self._flips = ALL_FLIPS if flips else [0]
+    self._any_colors = any_colors
+    self._index = {}
+    self._tiles = []
+
+  # key
+  #
+  # Get the canonical key of the tile, and the flip that produces it.
+  def key(self, tile):
+    data = tile.get_bytes()
+    if self._any_colors:
+      rows = get_pixel_rows(data)
+      variants = [(renumber_colors(flip_pixel_rows(rows, f)), f)
+                  for f in self._flips]
+    else:
+      variants = [(flip_bytes(data, f), f) for f in self._flips]
+    return min(variants)
+
+  # add
+  #
+  # Add a tile to the index. Returns the position of the matching tile that
+  # was kept, and the flip that turns that tile into this one.
+  #
+  # tile: A ChrTile.
+  def add(self, tile):
+    (key, flags) = self.key(tile)
+    found = self._index.get(key)
+    if found is None:
+      found = (len(self._tiles), flags)
+      self._index[key] = found
+      self._tiles.append(tile)
+    (n, first_flags) = found
+    return n, first_flags ^ flags
+
+  # tiles
+  #
+  # Get the tiles that were kept, in the order they were first added.
+  def tiles(self):
+    return self._tiles
+
+  def size(self):
+    return len(self._tiles)
+
+
+# merge_flips
+#
+# Merge tiles that are flips of each other. Returns the kept tiles, and for
+# each tile of chr_data, the number of its kept tile and the flip that turns
+# the kept tile back into it.
+#
+# chr_data: List of chr tiles.
+def merge_flips(chr_data):
+  index = TileIndex(flips=True)
+  mapping = [index.add(tile) for tile in chr_data]
+  return (index.tiles(), mapping)
+
+
+# get_report
+#
+# Count how many tiles the chr would need with each kind of deduplication.
+# Returns a list of pairs of description and count.
+#
+# chr_data: List of unique chr tiles.
+def get_report(chr_data):
+  report = []
+  for (desc, flips, any_colors) in [('with flips merged', True, False),
+                                    ('with colors merged', False, True),
+                                    ('with flips and colors merged', True,
+                                     True)]:
+    index = TileIndex(flips, any_colors)
+    for tile in chr_data:
+      index.add(tile)
+    report.append((desc, index.size()))
+  return report
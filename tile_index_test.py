@@ -0,0 +1,151 @@
+import unittest
+
+import app
+import chr_tile
+import errors
+import makechr
+import os
+from PIL import Image
+import shutil
+import StringIO
+import sys
+import tempfile
+import tile_index
+
+
+class TileIndexTests(unittest.TestCase):
+  def setUp(self):
+    # An L shape in color 1 with a single dot of color 2.
+    self.dot_profile = [0] * 64
+    for i in xrange(8):
+      self.dot_profile[i * 8] = 1
+      self.dot_profile[56 + i] = 1
+    self.dot_profile[9] = 2
+
+  def make_tile(self, xlat, flags=0):
+    rows = [self.dot_profile[y * 8:(y + 1) * 8] for y in xrange(8)]
+    rows = tile_index.flip_pixel_rows(rows, flags)
+    return chr_tile.from_dot_profile(sum(rows, []), xlat)
+
+  def read_file(self, filename):
+    fin = open(filename, 'rb')
+    content = fin.read()
+    fin.close()
+    return content
+
+  def test_flip_bytes(self):
+    tile = self.make_tile([0, 1, 2])
+    for flags in tile_index.ALL_FLIPS:
+      self.assertEqual(tile_index.flip_bytes(tile.get_bytes(), flags),
+                       self.make_tile([0, 1, 2], flags).get_bytes())
+
+  def test_exact(self):
+    index = tile_index.TileIndex()
+    self.assertEqual(index.add(self.make_tile([0, 1, 2])), (0, 0))
+    self.assertEqual(index.add(self.make_tile([0, 1, 2], 1)), (1, 0))
+    self.assertEqual(index.add(self.make_tile([0, 1, 2])), (0, 0))
+    self.assertEqual(index.size(), 2)
+
+  def test_flips(self):
+    index = tile_index.TileIndex(flips=True)
+    first = self.make_tile([0, 1, 2])
+    self.assertEqual(index.add(first)[0], 0)
+    for flags in tile_index.ALL_FLIPS:
+      tile = self.make_tile([0, 1, 2], flags)
+      (n, found_flags) = index.add(tile)
+      self.assertEqual(n, 0)
+      self.assertEqual(tile_index.flip_bytes(first.get_bytes(), found_flags),
+                       tile.get_bytes())
+    self.assertEqual(index.add(self.make_tile([0, 2, 1])), (1, 0))
+    self.assertEqual(index.tiles(), [first, self.make_tile([0, 2, 1])])
+
+  def test_merge_flips(self):
+    chr_data = [self.make_tile([0, 1, 2], flags)
+                for flags in tile_index.ALL_FLIPS + [0]]
+    chr_data.append(self.make_tile([0, 2, 1], tile_index.FLIP_V))
+    (tiles, mapping) = tile_index.merge_flips(chr_data)
+    self.assertEqual(len(tiles), 2)
+    self.assertEqual(len(mapping), len(chr_data))
+    for (tile, (n, flags)) in zip(chr_data, mapping):
+      self.assertEqual(tile_index.flip_bytes(tiles[n].get_bytes(), flags),
+                       tile.get_bytes())
+
+  def test_flip_chr_output(self):
+    img = Image.new('RGB', (256, 240), (0, 0, 0))
+    rows = [self.dot_profile[y * 8:(y + 1) * 8] for y in xrange(8)]
+    for (i, flags) in enumerate(tile_index.ALL_FLIPS):
+      flipped = tile_index.flip_pixel_rows(rows, flags)
+      for y in xrange(8):
+        for x in xrange(8):
+          if flipped[y][x]:
+            img.putpixel((i * 8 + x, y), (0, 0x78, 0xf8))
+    tmpdir = tempfile.mkdtemp()
+    try:
+      args = makechr.make_parser().parse_args(
+        ['-X', '-o', os.path.join(tmpdir, '%s.dat'),
+         '--flip-chr', os.path.join(tmpdir, 'flip.chr')])
+      real_stdout = sys.stdout
+      sys.stdout = StringIO.StringIO()
+      try:
+        self.assertTrue(app.Application().run(img, args))
+      finally:
+        sys.stdout = real_stdout
+      chr_bytes = self.read_file(os.path.join(tmpdir, 'chr.dat'))
+      flip_chr = self.read_file(os.path.join(tmpdir, 'flip.chr'))
+      flip_map = self.read_file(os.path.join(tmpdir, 'flip.map'))
+    finally:
+      shutil.rmtree(tmpdir)
+    # Blank tile, then the L shape and its three flips.
+    self.assertEqual(len(flip_map), 2 * 5)
+    rebuilt = ''
+    for k in xrange(0, len(flip_map), 2):
+      n = ord(flip_map[k])
+      flags = ord(flip_map[k + 1])
+      rebuilt += str(tile_index.flip_bytes(flip_chr[n * 16:(n + 1) * 16],
+                                           flags))
+    self.assertEqual(rebuilt, chr_bytes[:len(rebuilt)])
+    self.assertEqual(set([ord(c) for c in flip_map[0::2]]), set([0, 1]))
+
+  def test_flip_chr_too_many_tiles(self):
+    class FakeProcessor(object):
+      def __init__(self, chr_data):
+        self._chr_data = chr_data
+        self._err = errors.ErrorCollector()
+      def chr_data(self):
+        return self._chr_data
+      def err(self):
+        return self._err
+    # Keep only tiles that aren't flips of one already kept.
+    index = tile_index.TileIndex(flips=True)
+    n = 1
+    while index.size() < 257:
+      index.add(chr_tile.ChrTile(('%032x' % n).decode('hex')))
+      n += 1
+    chr_data = index.tiles()
+    processor = FakeProcessor(chr_data)
+    app.Application().check_flip_chr(processor)
+    self.assertEqual([str(e) for e in processor.err().get()],
+                     ['Needs 257 tiles, which do not fit in any of 1 chr bank'])
+    processor = FakeProcessor(chr_data[:256])
+    app.Application().check_flip_chr(processor)
+    self.assertFalse(processor.err().has())
+
+  def test_any_colors(self):
+    index = tile_index.TileIndex(any_colors=True)
+    index.add(self.make_tile([0, 1, 2]))
+    index.add(self.make_tile([0, 2, 1]))
+    index.add(self.make_tile([3, 1, 2]))
+    index.add(self.make_tile([0, 1, 2], tile_index.FLIP_V))
+    self.assertEqual(index.size(), 2)
+
+  def test_report(self):
+    chr_data = [self.make_tile([0, 1, 2]),
+                self.make_tile([0, 1, 2], tile_index.FLIP_H),
+                self.make_tile([0, 2, 1])]
+    self.assertEqual(tile_index.get_report(chr_data),
+                     [('with flips merged', 2), ('with colors merged', 2),
+                      ('with flips and colors merged', 1)])
+
+
+if __name__ == '__main__':
+  unittest.main()
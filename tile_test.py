@@ -3,6 +3,7 @@ import unittest
 import errors
 from PIL import Image
 import image_processor
+import palette
 
 
 class TileTests(unittest.TestCase):
@@ -58,6 +59,24 @@ class TileTests(unittest.TestCase):
     with self.assertRaises(errors.PaletteOverflowError):
       processor.process_tile(0, 0)
 
+  def test_process_image_selects_once_per_color_set(self):
+    img = Image.new('RGB', (256, 240), (0, 0x78, 0xf8))
+    img.paste((0xf8, 0x38, 0x00), (128, 0, 256, 240))
+    processor = image_processor.ImageProcessor()
+    calls = []
+    real_select = palette.Palette.select
+    def select(pal, color_needs):
+      calls.append(color_needs)
+      return real_select(pal, color_needs)
+    palette.Palette.select = select
+    try:
+      processor.process_image(img, None, None)
+    finally:
+      palette.Palette.select = real_select
+    self.assertFalse(processor.err().has())
+    self.assertEqual(len(calls), 2)
+    self.assertEqual(len(processor.chr_data()), 2)
+
 
 if __name__ == '__main__':
   unittest.main()
@@ -1,8 +1,10 @@
 from PIL import Image, ImageDraw
+import binary_output
 from constants import *
 import math
 import os
 import rgb
+import StringIO
 
 
 GRAY_COLOR = (64, 64, 64)
@@ -12,11 +14,19 @@ GRAY_PALETTE = [225, 150, 75, 0]
 SCALE_FACTOR = 2
 
 
+# Glyphs for the nametable view, shared by all renderers once loaded.
+_nt_font = None
+
+
 class ViewRenderer(object):
-  def __init__(self):
+  # only_changed: Whether to leave view files alone if they already hold the
+  #               same bytes.
+  def __init__(self, only_changed=False):
     self.img = None
     self.draw = None
     self.font = None
+    self._only_changed = only_changed
+    self._written = []
 
   def create_file(self, outfile, width, height, color=None):
     if color is None:
@@ -25,8 +35,26 @@ class ViewRenderer(object):
     self.draw = ImageDraw.Draw(self.img)
     self.outfile = outfile
 
+  # save_file
+  #
+  # Encode the view in the format named by the file's extension, then write
+  # it to the file.
   def save_file(self):
-    self.img.save(self.outfile)
+    ext = os.path.splitext(self.outfile)[1].lower()
+    format = Image.registered_extensions().get(ext)
+    if format is None:
+      raise ValueError('unknown file extension: {0}'.format(ext))
+    buf = StringIO.StringIO()
+    self.img.save(buf, format)
+    if binary_output.write_file(self.outfile, buf.getvalue(),
+                                only_changed=self._only_changed):
+      self._written.append(self.outfile)
+
+  # written
+  #
+  # Get the filenames of the views that were written to their files.
+  def written(self):
+    return self._written
 
   def to_tuple(self, value):
     r = value / (256 * 256)
@@ -57,11 +85,16 @@ class ViewRenderer(object):
     return os.path.join(os.path.dirname(os.path.realpath(__file__)), rel)
 
   def load_nt_font(self):
-    self.font = [None] * 16
-    font_img = Image.open(self.resource('res/nt_font.png'))
-    for n in range(16):
-      self.font[n] = font_img.crop([n*7,0,n*7+7,11])
-    font_img.close()
+    global _nt_font
+    if _nt_font is None:
+      font = [None] * 16
+      font_img = Image.open(self.resource('res/nt_font.png'))
+      for n in range(16):
+        font[n] = font_img.crop([n*7,0,n*7+7,11])
+        font[n].load()
+      font_img.close()
+      _nt_font = font
+    self.font = _nt_font
 
   def draw_block(self, block_y, block_x, poption):
     s = self.scale * 8
@@ -146,10 +179,10 @@ class ViewRenderer(object):
   def is_empty_block(self, y, x, artifacts, cmanifest, bg):
     # TODO: This could be much more efficient. Perhaps add a value to artifacts
     # that determines whether the tile / block is empty.
-    cid_0 = artifacts[y * 2  ][x * 2  ][ARTIFACT_CID]
-    cid_1 = artifacts[y * 2  ][x * 2+1][ARTIFACT_CID]
-    cid_2 = artifacts[y * 2+1][x * 2  ][ARTIFACT_CID]
-    cid_3 = artifacts[y * 2+1][x * 2+1][ARTIFACT_CID]
+    cid_0 = artifacts.get(y * 2  , x * 2  , ARTIFACT_CID)
+    cid_1 = artifacts.get(y * 2  , x * 2+1, ARTIFACT_CID)
+    cid_2 = artifacts.get(y * 2+1, x * 2  , ARTIFACT_CID)
+    cid_3 = artifacts.get(y * 2+1, x * 2+1, ARTIFACT_CID)
     if cid_0 == cid_1 and cid_1 == cid_2 and cid_2 == cid_3:
       color_needs = cmanifest.get(cid_0)
       if color_needs == [bg, None, None, None]:
@@ -184,7 +217,7 @@ class ViewRenderer(object):
     self.create_file(outfile, width, height)
     for y in xrange(NUM_BLOCKS_Y):
       for x in xrange(NUM_BLOCKS_X):
-        pid = artifacts[y * 2][x * 2][ARTIFACT_PID]
+        pid = artifacts.get(y * 2, x * 2, ARTIFACT_PID)
         poption = palette.get(pid)
         if self.is_empty_block(y, x, artifacts, cmanifest, poption[0]):
           self.draw_empty_block(y, x)
@@ -210,7 +243,7 @@ class ViewRenderer(object):
           for j in range(2):
             y = block_y * 2 + i
             x = block_x * 2 + j
-            nt = artifacts[y][x][ARTIFACT_NT]
+            nt = artifacts.get(y, x, ARTIFACT_NT)
             self.draw_square(y, x, nt_count[nt])
     self.save_file()
 
@@ -244,7 +277,7 @@ class ViewRenderer(object):
           for j in range(2):
             y = block_y * 2 + i
             x = block_x * 2 + j
-            nt = artifacts[y][x][ARTIFACT_NT]
+            nt = artifacts.get(y, x, ARTIFACT_NT)
             if nt != 0:
               self.draw_nt_value(y, x, nt)
     self.draw_grid(width, height)
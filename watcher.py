@@ -0,0 +1,155 @@
+import app
+import batch
+import copy
+from errors import CommandLineArgError
+import hashlib
+import nearest_color
+import os
+from PIL import Image
+import sys
+import time
+
+
+# Seconds to sleep between checks for changed images.
+POLL_INTERVAL = 0.5
+
+# Options that can't be used when watching, since they convert all images
+# together.
+UNSUPPORTED_OPTIONS = [('level', '--level'), ('manifest', '--manifest'),
+                       ('shared_chr', '--shared-chr')]
+
+
+def file_digest(filename):
+  fin = open(filename, 'rb')
+  try:
+    return hashlib.sha1(fin.read()).hexdigest()
+  finally:
+    fin.close()
+
+
+# Watcher
+#
+# Watches images, given either directly or as directories of png files, and
+# converts each one again when it changes. Checking only stats each file, and
+# sleeps in between, instead of busy polling. A file is only read and hashed
+# when its mtime or size changes, and only converted if its contents did, so
+# that saving an image without changing it does nothing. Outputs that come
+# out the same are not written again, so they don't trigger later builds.
+class Watcher(object):
+  # paths: List of image filenames and directories to watch.
+  # interval: Seconds to sleep between checks.
+  def __init__(self, paths, interval=POLL_INTERVAL):
+    self._paths = paths
+    self._interval = interval
+    self._stats = {}
+    self._digests = {}
+
+  # find_images
+  #
+  # Get the filenames of all watched images, in sorted order.
+  def find_images(self):
+    images = []
+    for path in self._paths:
+      if os.path.isdir(path):
+        images += sorted([os.path.join(path, f) for f in os.listdir(path)
+                          if f.lower().endswith('.png')])
+      else:
+        images.append(path)
+    return images
+
+  # poll
+  #
+  # Get the images whose contents changed since the last call. The first call
+  # returns every image.
+  def poll(self):
+    changed = []
+    images = self.find_images()
+    for filename in images:
+      try:
+        st = os.stat(filename)
+      except OSError:
+        continue
+      stat = (st.st_mtime, st.st_size)
+      if self._stats.get(filename) == stat:
+        continue
+      try:
+        digest = file_digest(filename)
+      except IOError:
+        continue
+      self._stats[filename] = stat
+      if self._digests.get(filename) != digest:
+        self._digests[filename] = digest
+        changed.append(filename)
+    # Forget images that were removed, so they are converted if they return.
+    for filename in set(self._stats) - set(images):
+      del self._stats[filename]
+      self._digests.pop(filename, None)
+    return changed
+
+  # check_args
+  #
+  # Make sure the arguments can be used for watching. Filename options need
+  # "%n" unless a single image is being watched, since more may be added to
+  # a directory later.
+  def check_args(self, args):
+    for (option, flag) in UNSUPPORTED_OPTIONS:
+      if getattr(args, option):
+        raise CommandLineArgError('%s can not be used with --watch' % flag)
+    if args.jobs > 1:
+      raise CommandLineArgError('--jobs can not be used with --watch')
+    if self.is_single_image():
+      return
+    batch.check_filename_options(args)
+
+  def is_single_image(self):
+    return len(self._paths) == 1 and not os.path.isdir(self._paths[0])
+
+  # image_args
+  #
+  # Make the arguments for converting a single image. A single image is
+  # converted the same as makechr.py would, otherwise "%n" is replaced the
+  # same as in a batch.
+  def image_args(self, filename, args):
+    if self.is_single_image():
+      image_args = copy.copy(args)
+    else:
+      runner = batch.BatchRunner()
+      image_args = runner.job_args(batch.BatchJob(filename), args)
+    image_args.input = filename
+    return image_args
+
+  # convert
+  #
+  # Convert an image, showing which outputs were written. Returns whether it
+  # succeeded.
+  def convert(self, filename, args):
+    print('== {0}'.format(filename))
+    try:
+      img = Image.open(filename)
+    except IOError:
+      print('Could not open "{0}"'.format(filename))
+      return False
+    application = app.Application()
+    ok = application.run(img, self.image_args(filename, args))
+    if ok:
+      print('Wrote {0} changed output{1}'.format(
+          len(application.written), 's'[len(application.written) == 1:]))
+    return ok
+
+  # run
+  #
+  # Convert every image, then keep converting images as they change, until
+  # interrupted.
+  #
+  # args: Command-line arguments.
+  def run(self, args):
+    self.check_args(args)
+    nearest_color.get_table()
+    try:
+      while True:
+        for filename in self.poll():
+          self.convert(filename, args)
+          sys.stdout.flush()
+        time.sleep(self._interval)
+    except KeyboardInterrupt:
+      pass
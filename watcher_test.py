@@ -0,0 +1,107 @@
+import unittest
+
+import app
+from errors import CommandLineArgError
+import makechr
+import os
+import shutil
+import StringIO
+import sys
+import tempfile
+import watcher
+
+
+class WatcherTests(unittest.TestCase):
+  def setUp(self):
+    self.tmpdir = tempfile.mkdtemp()
+    self.real_stdout = sys.stdout
+    sys.stdout = StringIO.StringIO()
+
+  def tearDown(self):
+    sys.stdout = self.real_stdout
+    shutil.rmtree(self.tmpdir)
+
+  def make_args(self, *argv):
+    return makechr.make_parser().parse_args(['-X', '--watch'] + list(argv))
+
+  def copy_image(self, src, name):
+    filename = os.path.join(self.tmpdir, name)
+    shutil.copyfile(os.path.join('testdata', src), filename)
+    return filename
+
+  def test_poll(self):
+    a = self.copy_image('blue-tile.png', 'a.png')
+    self.copy_image('red-and-blue-tile.png', 'b.png')
+    w = watcher.Watcher([self.tmpdir])
+    self.assertEqual(w.poll(), [a, os.path.join(self.tmpdir, 'b.png')])
+    self.assertEqual(w.poll(), [])
+    # A new mtime with the same contents is not a change.
+    os.utime(a, (0, 0))
+    self.assertEqual(w.poll(), [])
+    self.copy_image('blue-and-red-tile.png', 'a.png')
+    os.utime(a, (1, 1))
+    self.assertEqual(w.poll(), [a])
+    os.remove(a)
+    self.assertEqual(w.poll(), [])
+    self.copy_image('blue-and-red-tile.png', 'a.png')
+    self.assertEqual(w.poll(), [a])
+
+  def test_check_args(self):
+    w = watcher.Watcher([self.tmpdir])
+    with self.assertRaises(CommandLineArgError):
+      w.check_args(self.make_args('-c', 'game.nes'))
+    w.check_args(self.make_args('-c', '%n.nes'))
+    with self.assertRaises(CommandLineArgError):
+      w.check_args(self.make_args('--shared-chr', 'all.chr'))
+    w = watcher.Watcher([os.path.join(self.tmpdir, 'a.png')])
+    w.check_args(self.make_args('-c', 'game.nes'))
+
+  def test_convert_writes_changed_outputs(self):
+    a = self.copy_image('blue-tile.png', 'a.png')
+    args = self.make_args('-o', os.path.join(self.tmpdir, '%s.dat'))
+    w = watcher.Watcher([a])
+    self.assertTrue(w.convert(a, args))
+    self.assertIn('Wrote 4 changed outputs', sys.stdout.getvalue())
+    self.assertTrue(w.convert(a, args))
+    self.assertIn('Wrote 0 changed outputs', sys.stdout.getvalue())
+    self.copy_image('blue-and-red-tile.png', 'a.png')
+    self.assertTrue(w.convert(a, args))
+    self.assertTrue(os.path.isfile(os.path.join(self.tmpdir, 'chr.dat')))
+
+  def test_convert_writes_changed_views(self):
+    a = self.copy_image('blue-tile.png', 'a.png')
+    view = os.path.join(self.tmpdir, 'palette.png')
+    args = self.make_args('-o', os.path.join(self.tmpdir, '%s.dat'),
+                          '--palette-view', view)
+    w = watcher.Watcher([a])
+    self.assertTrue(w.convert(a, args))
+    self.assertIn('Wrote 5 changed outputs', sys.stdout.getvalue())
+    os.utime(view, (0, 0))
+    self.assertTrue(w.convert(a, args))
+    self.assertIn('Wrote 0 changed outputs', sys.stdout.getvalue())
+    self.assertEqual(os.path.getmtime(view), 0)
+
+  def test_cache_hit_writes_changed_outputs(self):
+    a = self.copy_image('blue-tile.png', 'a.png')
+    args = self.make_args('-o', os.path.join(self.tmpdir, '%s.dat'),
+                          '--cache-dir', os.path.join(self.tmpdir, 'cache'))
+    w = watcher.Watcher([a])
+    w.check_args(args)
+    self.assertTrue(w.convert(a, args))
+    outputs = [os.path.join(self.tmpdir, kind + '.dat')
+               for kind in ['nametable', 'chr', 'palette', 'attribute']]
+    for filename in outputs:
+      os.utime(filename, (0, 0))
+    # The image is unchanged, so its outputs come from the cache.
+    real_convert = app.Application.convert
+    app.Application.convert = None
+    try:
+      self.assertTrue(w.convert(a, args))
+    finally:
+      app.Application.convert = real_convert
+    self.assertIn('Wrote 0 changed outputs', sys.stdout.getvalue())
+    self.assertEqual([os.path.getmtime(f) for f in outputs], [0] * 4)
+
+
+if __name__ == '__main__':
+  unittest.main()